@@ -0,0 +1,141 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Optional compiled kernels for the DDSketch batch insert path.
+
+This extension is built by setup.py when Cython is available. It mirrors the
+Numba kernels in _kernels.py but needs no JIT warm-up, and it releases the GIL
+while counting a batch. It also provides the single-bucket updates used by
+ContiguousStorage.add and remove, and the scalar index kernels of the
+interpolated mappings (see mapping/_kernels.py).
+"""
+
+from libc.math cimport ceil, frexp, log
+cimport numpy as cnp
+
+cnp.import_array()
+
+# Every integer dtype ContiguousStorage accepts as count_dtype
+ctypedef fused count_t:
+    unsigned char
+    unsigned short
+    unsigned int
+    unsigned long long
+    signed char
+    short
+    int
+    long long
+
+
+def log_insert_batch(const double[::1] values, count_t[::1] counts, double multiplier,
+                     long long min_index, long long max_index,
+                     long long arr_index_of_min_bucket):
+    """
+    Map positive values with the logarithmic mapping and count them directly
+    into the circular bucket buffer of a ContiguousStorage.
+
+    The caller must have reserved [min_index, max_index] in the storage so that
+    every index of the batch fits in the buffer. Indices are clamped to that
+    range to guard against last-ulp differences between libm implementations
+    at bucket boundaries.
+    """
+    cdef Py_ssize_t i
+    cdef long long n = counts.shape[0]
+    cdef long long idx, pos
+    cdef unsigned long long last_offset = <unsigned long long>(max_index - min_index)
+    # Buffer position of bucket 0, so each value costs one add and at most one
+    # wrap-around subtraction instead of a modulo
+    cdef long long head = arr_index_of_min_bucket % n
+    if head < 0:
+        head += n
+    head -= min_index
+    with nogil:
+        for i in range(values.shape[0]):
+            idx = <long long>ceil(log(values[i]) * multiplier)
+            # One unsigned compare covers both bounds: an index below
+            # min_index wraps around to a huge offset
+            if <unsigned long long>(idx - min_index) > last_offset:
+                idx = min_index if idx < min_index else max_index
+            pos = idx + head
+            if pos >= n:
+                pos -= n
+            counts[pos] += 1
+
+
+cdef inline count_t _add(count_t* slot, long long count):
+    cdef count_t old = slot[0]
+    slot[0] = <count_t>(old + count)
+    return old
+
+
+cdef inline count_t _sub(count_t* slot, long long count):
+    cdef count_t old = slot[0]
+    if <unsigned long long>count < <unsigned long long>old:
+        slot[0] = <count_t>(old - count)
+    else:
+        slot[0] = 0
+    return old
+
+
+def bucket_add(cnp.ndarray counts, Py_ssize_t pos, long long count):
+    """
+    Add count to counts[pos] and return the previous count.
+    
+    counts must be a contiguous 1-D integer buffer and pos a valid position;
+    neither is checked. The element is read and written through a typed
+    pointer instead of NumPy scalar indexing.
+    """
+    cdef void* data = cnp.PyArray_DATA(counts)
+    cdef int type_num = cnp.PyArray_TYPE(counts)
+    if type_num == cnp.NPY_UINT32:
+        return _add(<unsigned int*>data + pos, count)
+    elif type_num == cnp.NPY_INT64:
+        return _add(<long long*>data + pos, count)
+    elif type_num == cnp.NPY_UINT16:
+        return _add(<unsigned short*>data + pos, count)
+    elif type_num == cnp.NPY_UINT64:
+        return _add(<unsigned long long*>data + pos, count)
+    elif type_num == cnp.NPY_INT32:
+        return _add(<int*>data + pos, count)
+    # Any other integer dtype goes through NumPy
+    old = counts.item(pos)
+    counts[pos] = old + count
+    return old
+
+
+def bucket_sub(cnp.ndarray counts, Py_ssize_t pos, long long count):
+    """
+    Subtract count from counts[pos], saturating at zero, and return the
+    previous count.
+    
+    Same requirements as bucket_add; count must be positive.
+    """
+    cdef void* data = cnp.PyArray_DATA(counts)
+    cdef int type_num = cnp.PyArray_TYPE(counts)
+    if type_num == cnp.NPY_UINT32:
+        return _sub(<unsigned int*>data + pos, count)
+    elif type_num == cnp.NPY_INT64:
+        return _sub(<long long*>data + pos, count)
+    elif type_num == cnp.NPY_UINT16:
+        return _sub(<unsigned short*>data + pos, count)
+    elif type_num == cnp.NPY_UINT64:
+        return _sub(<unsigned long long*>data + pos, count)
+    elif type_num == cnp.NPY_INT32:
+        return _sub(<int*>data + pos, count)
+    # Any other integer dtype goes through NumPy
+    old = counts.item(pos)
+    counts[pos] = old - min(count, old)
+    return old
+
+
+def linear_bucket_index(double value, double inv_log_gamma):
+    """Bucket index of a positive finite value under the linear interpolation mapping."""
+    cdef int exponent
+    cdef double mantissa = frexp(value, &exponent)
+    return <long long>ceil(((exponent - 1) + (mantissa * 2 - 1)) * inv_log_gamma)
+
+
+def cubic_bucket_index(double value, double a, double b, double c, double index_multiplier):
+    """Bucket index of a positive finite value under the cubic interpolation mapping."""
+    cdef int exponent
+    cdef double s = frexp(value, &exponent) * 2 - 1
+    return <long long>ceil(((exponent - 1) + s * (c + s * (b + s * a))) * index_multiplier)
@@ -0,0 +1,64 @@
+"""
+Optional compiled kernels for the DDSketch batch insert path.
+
+Neither Numba nor the Cython extension (_fastcore, built by setup.py when
+Cython is installed) is a required dependency. The compiled extension is
+preferred since it needs no JIT warm-up; otherwise the Numba kernels are used.
+When neither is available the kernels are None and DDSketch falls back to the
+vectorized NumPy implementation.
+"""
+
+import math
+
+# The kernels take a scalar log per value; past this batch size NumPy's
+# vectorized log wins and DDSketch uses the NumPy path instead
+KERNEL_MAX_BATCH = 16384
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the environment
+    njit = None
+    NUMBA_AVAILABLE = False
+
+
+def _log_insert_batch(values, counts, multiplier, min_index, max_index, arr_index_of_min_bucket):
+    """
+    Map positive values with the logarithmic mapping and count them directly
+    into the circular bucket buffer of a ContiguousStorage.
+    
+    The caller must have reserved [min_index, max_index] in the storage so that
+    every index of the batch fits in the buffer. Indices are clamped to that
+    range to guard against last-ulp differences between libm implementations
+    at bucket boundaries.
+    """
+    n = counts.shape[0]
+    # Buffer position of bucket 0; reserve() leaves the head in [0, n), so
+    # each position needs at most one wrap-around subtraction
+    head = arr_index_of_min_bucket - min_index
+    for v in values:
+        idx = math.ceil(math.log(v) * multiplier)
+        if idx < min_index:
+            idx = min_index
+        elif idx > max_index:
+            idx = max_index
+        pos = idx + head
+        if pos >= n:
+            pos -= n
+        counts[pos] += 1
+
+
+try:
+    from . import _fastcore
+    FASTCORE_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the build
+    _fastcore = None
+    FASTCORE_AVAILABLE = False
+
+
+if FASTCORE_AVAILABLE:
+    log_insert_batch = _fastcore.log_insert_batch
+elif NUMBA_AVAILABLE:
+    log_insert_batch = njit(cache=True)(_log_insert_batch)
+else:
+    log_insert_batch = None
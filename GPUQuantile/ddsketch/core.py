@@ -1,12 +1,14 @@
 """Core DDSketch implementation."""
 
 from typing import Literal, Union
+import numpy as np
 from .mapping.logarithmic import LogarithmicMapping
 from .mapping.linear_interpolation import LinearInterpolationMapping
 from .mapping.cubic_interpolation import CubicInterpolationMapping
 from .storage.base import BucketManagementStrategy
 from .storage.contiguous import ContiguousStorage
 from .storage.sparse import SparseStorage
+from . import _kernels
 
 class DDSketch:
     """
@@ -27,7 +29,9 @@ class DDSketch:
         mapping_type: Literal['logarithmic', 'lin_interpol', 'cub_interpol'] = 'logarithmic',
         max_buckets: int = 2048,
         bucket_strategy: BucketManagementStrategy = BucketManagementStrategy.FIXED,
-        cont_neg: bool = True
+        cont_neg: bool = True,
+        use_fast_backend: bool = True,
+        count_dtype: np.dtype = np.uint32
     ):
         """
         Initialize DDSketch.
@@ -44,6 +48,12 @@ class DDSketch:
             bucket_strategy: Strategy for managing bucket count.
                            If FIXED, uses ContiguousStorage, otherwise uses SparseStorage.
             cont_neg: Whether to handle negative values (default True).
+            use_fast_backend: Whether batch inserts may use the compiled
+                            kernels (Cython extension or Numba) when they are
+                            installed (default True).
+            count_dtype: Integer dtype of the ContiguousStorage count buffers
+                       (default uint32). Buffers are widened to int64 once
+                       the count outgrows it. Ignored by SparseStorage.
         
         Raises:
             ValueError: If relative_accuracy is not between 0 and 1.
@@ -53,7 +63,7 @@ class DDSketch:
             
         self.relative_accuracy = relative_accuracy
         self.cont_neg = cont_neg
-        
+        self.use_fast_backend = use_fast_backend
         
         # Initialize mapping scheme
         if mapping_type == 'logarithmic':
@@ -65,14 +75,18 @@ class DDSketch:
             
         # Choose storage type based on strategy
         if bucket_strategy == BucketManagementStrategy.FIXED:
-            self.positive_store = ContiguousStorage(max_buckets)
-            self.negative_store = ContiguousStorage(max_buckets) if cont_neg else None
+            self.positive_store = ContiguousStorage(max_buckets, count_dtype)
+            self.negative_store = ContiguousStorage(max_buckets, count_dtype) if cont_neg else None
         else:
             self.positive_store = SparseStorage(strategy=bucket_strategy)
             self.negative_store = SparseStorage(strategy=bucket_strategy) if cont_neg else None
             
         self.count = 0
         self.zero_count = 0
+        # Magnitude and bucket index of the last inserted value; streams often
+        # repeat values, and a repeat then skips the mapping
+        self._last_value = None
+        self._last_index = 0
     
     def insert(self, value: Union[int, float]) -> None:
         """
@@ -87,15 +101,94 @@ class DDSketch:
         if value == 0:
             self.zero_count += 1
         elif value > 0:
-            bucket_idx = self.mapping.compute_bucket_index(value)
-            self.positive_store.add(bucket_idx)
+            if value != self._last_value:
+                self._last_index = self.mapping.compute_bucket_index(value)
+                self._last_value = value
+            self.positive_store.add(self._last_index)
         elif value < 0 and self.cont_neg:
-            bucket_idx = self.mapping.compute_bucket_index(-value)
-            self.negative_store.add(bucket_idx)
+            value = -value
+            if value != self._last_value:
+                self._last_index = self.mapping.compute_bucket_index(value)
+                self._last_value = value
+            self.negative_store.add(self._last_index)
         elif value < 0:
             raise ValueError("Negative values not supported when cont_neg is False")
         self.count += 1
     
+    def insert_many(self, values: np.ndarray) -> None:
+        """
+        Insert a batch of values into the sketch.
+        
+        Bucket indices for the whole batch are computed with one vectorized
+        mapping call and deduplicated, so each store is updated once per
+        distinct bucket with no per-value Python work.
+        
+        Args:
+            values: Array-like of values to insert.
+            
+        Raises:
+            ValueError: If values contains NaN or inf, or negatives and
+                        cont_neg is False.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+        # NaN and inf have no bucket; reject them before any store is touched,
+        # whichever backend would map the batch
+        if not np.isfinite(values).all():
+            raise ValueError("Values must be finite")
+            
+        # The sign split is done with whole-array masks rather than a
+        # per-value branch, which mispredicts on mixed-sign streams
+        pos = values > 0
+        if pos.all():
+            # All-positive batches (e.g. latencies) need no masking or copies
+            self._add_batch_to_store(self.positive_store, values)
+        else:
+            neg = values < 0
+            if not self.cont_neg and neg.any():
+                raise ValueError("Negative values not supported when cont_neg is False")
+                
+            self.zero_count += int(np.count_nonzero(values == 0))
+            # np.compress gathers several times faster than boolean indexing
+            # when the signs are interleaved irregularly
+            self._add_batch_to_store(self.positive_store, np.compress(pos, values))
+            if self.cont_neg:
+                self._add_batch_to_store(self.negative_store, -np.compress(neg, values))
+        self.count += values.size
+    
+    def _add_batch_to_store(self, store, values: np.ndarray) -> None:
+        """Map a batch of positive values to buckets and add them to store."""
+        if values.size == 0:
+            return
+        if (self.use_fast_backend
+                and _kernels.log_insert_batch is not None
+                and values.size <= _kernels.KERNEL_MAX_BATCH
+                and isinstance(self.mapping, LogarithmicMapping)
+                and isinstance(store, ContiguousStorage)):
+            # The mapping is monotonic, so the extreme values bound the batch's
+            # bucket range and the whole batch can be counted in place
+            min_idx = self.mapping.compute_bucket_index(values.min())
+            max_idx = self.mapping.compute_bucket_index(values.max())
+            if store.reserve(min_idx, max_idx, values.size):
+                _kernels.log_insert_batch(
+                    values, store.raw_array(), self.mapping.multiplier,
+                    store.min_index, store.max_index, store.arr_index_of_min_bucket
+                )
+                store.record_raw_add(values.size)
+                return
+        # Many values share a bucket, so collapse duplicate indices before
+        # touching the store; a dense bincount beats sorting when the batch
+        # spans no more buckets than it has values
+        indices = self.mapping.compute_bucket_indices(values)
+        lo = int(indices.min())
+        if int(indices.max()) - lo < indices.size:
+            bucket_counts = np.bincount(indices - lo)
+            occupied = np.flatnonzero(bucket_counts)
+            store.add_many(occupied + lo, bucket_counts[occupied])
+        else:
+            store.add_many(*np.unique(indices, return_counts=True))
+    
     def delete(self, value: Union[int, float]) -> None:
         """
         Delete a value from the sketch.
@@ -148,27 +241,23 @@ class DDSketch:
         if self.cont_neg:
             neg_count = self.negative_store.total_count
             if rank < neg_count:
-                # Handle negative values
-                curr_count = 0
-                if self.negative_store.min_index is not None:
-                    for idx in range(self.negative_store.max_index, self.negative_store.min_index - 1, -1):
-                        bucket_count = self.negative_store.get_count(idx)
-                        curr_count += bucket_count
-                        if curr_count > rank:
-                            return -self.mapping.compute_value_from_index(idx)
+                # Handle negative values, which are ordered from the highest
+                # bucket index down: find the highest bucket whose count from
+                # the top exceeds rank, i.e. the first cumulative count from
+                # the bottom that reaches neg_count - rank
+                bucket = self.negative_store.quantile_bucket(neg_count - rank, side='left')
+                if bucket is not None:
+                    return -self.mapping.compute_value_from_index(bucket)
             rank -= neg_count
             
         if rank < self.zero_count:
             return 0
         rank -= self.zero_count
         
-        curr_count = 0
-        if self.positive_store.min_index is not None:
-            for idx in range(self.positive_store.min_index, self.positive_store.max_index + 1):
-                bucket_count = self.positive_store.get_count(idx)
-                curr_count += bucket_count
-                if curr_count > rank:
-                    return self.mapping.compute_value_from_index(idx)
+        # First bucket whose cumulative count exceeds rank
+        bucket = self.positive_store.quantile_bucket(rank)
+        if bucket is not None:
+            return self.mapping.compute_value_from_index(bucket)
                 
         return float('inf')
     
@@ -188,7 +277,7 @@ class DDSketch:
         self.positive_store.merge(other.positive_store)
         if self.cont_neg and other.cont_neg:
             self.negative_store.merge(other.negative_store)
-        elif other.cont_neg and sum(other.negative_store.counts.values()) > 0:
+        elif other.cont_neg and other.negative_store.total_count > 0:
             raise ValueError("Cannot merge sketch containing negative values when cont_neg is False")
             
         self.zero_count += other.zero_count
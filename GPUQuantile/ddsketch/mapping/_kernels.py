@@ -0,0 +1,65 @@
+"""
+Optional compiled kernels for the scalar mapping paths.
+
+The interpolated mappings compute an index with a handful of float operations
+that cost several interpreted method calls in Python; compiled, a call is
+mostly dispatch overhead. The ahead-of-time compiled versions in the Cython
+extension (_fastcore, built by setup.py when Cython is installed) are
+preferred: they load like any C extension and their calls are cheaper than
+going through a Numba dispatcher. Otherwise the Numba kernels are used, and
+without either the kernels are None and the mappings keep their pure Python
+implementations.
+
+The logarithmic mapping has no kernel, since math.log on a Python float is
+already cheaper than a call into a compiled function.
+
+fastmath is deliberately off (and floating-point contraction for the
+extension) so that the compiled kernels round exactly like the Python and
+NumPy paths and every path agrees on bucket boundaries.
+"""
+
+import math
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the environment
+    njit = None
+    NUMBA_AVAILABLE = False
+
+
+def _linear_bucket_index(value, inv_log_gamma):
+    """Bucket index of a positive finite value under the linear interpolation mapping."""
+    mantissa, exponent = math.frexp(value)
+    # frexp gives mantissa in [0.5, 1); log2 is approximated by
+    # floor(log2) + (normalized fraction - 1)
+    return math.ceil(((exponent - 1) + (mantissa * 2 - 1)) * inv_log_gamma)
+
+
+def _cubic_bucket_index(value, a, b, c, index_multiplier):
+    """Bucket index of a positive finite value under the cubic interpolation mapping."""
+    mantissa, exponent = math.frexp(value)
+    s = mantissa * 2 - 1
+    return math.ceil(((exponent - 1) + s * (c + s * (b + s * a))) * index_multiplier)
+
+
+try:
+    from .. import _fastcore
+    FASTCORE_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the build
+    _fastcore = None
+    FASTCORE_AVAILABLE = False
+
+
+if FASTCORE_AVAILABLE:
+    linear_bucket_index = _fastcore.linear_bucket_index
+    cubic_bucket_index = _fastcore.cubic_bucket_index
+elif NUMBA_AVAILABLE:
+    # Explicit signatures compile at import (or load from the cache), so the
+    # first mapping call does not pay for JIT compilation
+    linear_bucket_index = njit("int64(float64, float64)", cache=True)(_linear_bucket_index)
+    cubic_bucket_index = njit("int64(float64, float64, float64, float64, float64)",
+                              cache=True)(_cubic_bucket_index)
+else:
+    linear_bucket_index = None
+    cubic_bucket_index = None
@@ -1,11 +1,16 @@
 """Base class for DDSketch mapping schemes."""
 
+import functools
 from abc import ABC, abstractmethod
 
+import numpy as np
+
 
 class MappingScheme(ABC):
     """Abstract base class for different mapping schemes."""
     
+    VALUE_CACHE_SIZE = 4096  # Bucket values memoized per instance by _memoize_values
+    
     @abstractmethod
     def compute_bucket_index(self, value: float) -> int:
         """Compute the bucket index for a given value."""
@@ -14,4 +19,70 @@ class MappingScheme(ABC):
     @abstractmethod
     def compute_value_from_index(self, index: int) -> float:
         """Compute the representative value for a given bucket index."""
-        pass
\ No newline at end of file
+        pass
+
+    def compute_bucket_indices(self, values: np.ndarray) -> np.ndarray:
+        """
+        Compute the bucket indices for an array of values.
+        
+        Subclasses override this with a vectorized implementation; the default
+        falls back to calling compute_bucket_index once per value.
+        
+        Args:
+            values: Array of positive values.
+            
+        Returns:
+            Array of bucket indices with dtype int64.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        return np.fromiter((self.compute_bucket_index(v) for v in values),
+                           dtype=np.int64, count=len(values))
+
+    def compute_values_from_indices(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Compute the representative values for an array of bucket indices.
+        
+        Subclasses override this with a vectorized implementation; the default
+        falls back to calling compute_value_from_index once per index.
+        
+        Args:
+            indices: Array of bucket indices.
+            
+        Returns:
+            Array of values with dtype float64.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        return np.fromiter((self.compute_value_from_index(i) for i in indices.tolist()),
+                           dtype=np.float64, count=len(indices))
+
+    def _specialize(self):
+        """
+        Bind per-instance overrides of the mapping methods.
+        
+        Called at the end of __init__ and again after unpickling, since the
+        overrides themselves are not picklable. The default binds nothing.
+        """
+        return
+
+    def _memoize_values(self):
+        """
+        Cache compute_value_from_index on this instance.
+        
+        The mapping is immutable after construction and quantile queries keep
+        asking for the same few bucket indices, so schemes whose inverse is
+        expensive memoize it with an LRU cache bounded by VALUE_CACHE_SIZE.
+        """
+        self.compute_value_from_index = functools.lru_cache(maxsize=self.VALUE_CACHE_SIZE)(
+            type(self).compute_value_from_index.__get__(self)
+        )
+
+    def __getstate__(self):
+        # Instance-level overrides are rebuilt by _specialize in __setstate__
+        state = self.__dict__.copy()
+        state.pop('compute_bucket_index', None)
+        state.pop('compute_value_from_index', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._specialize()
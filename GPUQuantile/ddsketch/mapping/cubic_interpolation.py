@@ -15,8 +15,15 @@ memory overhead while maintaining the relative accuracy guarantee.
 Memory overhead is approximately 1% compared to the optimal logarithmic mapping.
 """
 
+import math
 import numpy as np
 from .base import MappingScheme
+from ._kernels import cubic_bucket_index
+
+
+def _cbrt(x: float) -> float:
+    """Real cube root of x (math.cbrt is only available from Python 3.11)."""
+    return math.copysign(abs(x) ** (1/3), x)
 
 
 class CubicInterpolationMapping(MappingScheme):
@@ -36,6 +43,43 @@ class CubicInterpolationMapping(MappingScheme):
         # Divide by C as per Datadog's implementation
         self.m = 1/ (self.C * np.log(2))
         
+        # Fold the constant factors of the index formula so the per-value
+        # paths multiply instead of divide
+        self.index_multiplier = self.m / self.log2_gamma
+        self.inv_index_multiplier = self.log2_gamma / self.m
+        self.center_factor = 2.0 / (1.0 + self.gamma)
+        
+        # Constants of the depressed cubic x³ + px + q = 0 solved when inverting
+        # P(s) = f; only q depends on f, as q = q0 - f/A
+        a, b, c = self.A, self.B, self.C
+        self._cardano_p = (3*a*c - b*b)/(3*a*a)
+        self._cardano_q0 = (2*b*b*b - 9*a*b*c)/(27*a*a*a)
+        self._cardano_shift = b/(3*a)
+        self._cardano_p3_27 = self._cardano_p**3/27
+        self._inv_A = 1/a
+        self._specialize()
+        
+    def _specialize(self):
+        # Solving the cubic for every lookup is costly and quantile queries
+        # revisit the same indices, so memoize it
+        self._memoize_values()
+        if cubic_bucket_index is None:
+            return
+            
+        # Positive finite values go to the compiled kernel; anything else
+        # takes the reference method so errors are raised as before
+        reference = type(self).compute_bucket_index.__get__(self)
+        
+        def compute_bucket_index(value: float, _kernel=cubic_bucket_index,
+                                 _a=self.A, _b=self.B, _c=self.C,
+                                 _index_multiplier=self.index_multiplier, _inf=math.inf,
+                                 _reference=reference) -> int:
+            if 0 < value < _inf:
+                return _kernel(value, _a, _b, _c, _index_multiplier)
+            return _reference(value)
+        
+        self.compute_bucket_index = compute_bucket_index
+        
     def _extract_exponent_and_significand(self, value: float) -> tuple[int, float]:
         """
         Extract the binary exponent and normalized significand from an IEEE 754 float.
@@ -44,7 +88,7 @@ class CubicInterpolationMapping(MappingScheme):
             tuple: (exponent, significand)
             where significand is in [0, 1)
         """
-        bits = np.frexp(value)
+        bits = math.frexp(value)
         exponent = bits[1] - 1  # frexp returns 2's exponent, we need floor(log2)
         significand = bits[0] * 2 - 1  # Map [0.5, 1) to [0, 1)
         return exponent, significand
@@ -71,8 +115,21 @@ class CubicInterpolationMapping(MappingScheme):
         # I_α = m * (e + P(s)) / log_2(γ)
         # where m is the optimal multiplier, e is the exponent,
         # P(s) is the cubic interpolation, and γ is (1+α)/(1-α)
-        index = self.m * (exponent + interpolated) / self.log2_gamma
-        return int(np.ceil(index))
+        index = (exponent + interpolated) * self.index_multiplier
+        return math.ceil(index)
+        
+    def compute_bucket_indices(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        # inf would map to INT64_MIN once cast, so reject it with the rest
+        if not np.all(np.isfinite(values) & (values > 0)):
+            raise ValueError("Values must be positive and finite")
+            
+        # Same frexp decomposition and Horner evaluation as the scalar path,
+        # applied to the whole batch in a few array passes
+        mantissa, exponent = np.frexp(values)
+        s = mantissa * 2 - 1
+        interpolated = s * (self.C + s * (self.B + s * self.A))
+        return np.ceil(((exponent - 1) + interpolated) * self.index_multiplier).astype(np.int64)
         
     def compute_value_from_index(self, index: float) -> float:
         """
@@ -80,46 +137,42 @@ class CubicInterpolationMapping(MappingScheme):
         for solving the cubic equation.
         """
         # Convert index to target log value
-        target = (index * self.log2_gamma) / self.m
+        target = index * self.inv_index_multiplier
         
         # Extract integer and fractional parts
-        e = int(np.floor(target))
+        e = math.floor(target)
         f = target - e
+        if e > 1023:
+            # Beyond the largest finite double
+            return math.inf
         
         # If f is close to 0 or 1, return power of 2 directly
         if f < 1e-10:
-            return np.power(2.0, e)
+            return math.ldexp(1.0, e)
         if abs(f - 1) < 1e-10:
-            return np.power(2.0, e + 1)
+            return 2.0 * math.ldexp(1.0, e)  # Overflows to inf rather than raising
             
         # Solve cubic equation As³ + Bs² + Cs - f = 0
-        # Using Cardano's formula
-        a = self.A
-        b = self.B
-        c = self.C
-        d = -f
-        
-        # Convert to standard form x³ + px + q = 0
-        p = (3*a*c - b*b)/(3*a*a)
-        q = (2*b*b*b - 9*a*b*c + 27*a*a*d)/(27*a*a*a)
+        # Using Cardano's formula on the standard form x³ + px + q = 0
+        p = self._cardano_p
+        half_q = (self._cardano_q0 - f * self._inv_A) * 0.5
         
         # Compute discriminant
-        D = q*q/4 + p*p*p/27
+        D = half_q*half_q + self._cardano_p3_27
         
         if D > 0:
             # One real root
-            u = np.cbrt(-q/2 + np.sqrt(D))
-            v = np.cbrt(-q/2 - np.sqrt(D))
-            s = u + v - b/(3*a)
+            sqrt_D = math.sqrt(D)
+            s = _cbrt(sqrt_D - half_q) - _cbrt(half_q + sqrt_D) - self._cardano_shift
         else:
             # Three real roots, we want the one in [0,1]
-            phi = np.arccos(-q/(2*np.sqrt(-(p*p*p/27))))
-            s = 2*np.sqrt(-p/3)*np.cos(phi/3) - b/(3*a)
+            phi = math.acos(-half_q/math.sqrt(-self._cardano_p3_27))
+            s = 2*math.sqrt(-p/3)*math.cos(phi/3) - self._cardano_shift
             
         # Clamp result to [0,1] to handle numerical errors
-        s = np.clip(s, 0, 1)
+        s = min(max(s, 0.0), 1.0)
         
         # Apply geometric mean adjustment and proper scaling for cubic interpolation
         # The multiplier 7.0/10.0 is derived from the optimal cubic interpolation error bound
-        base_value = np.power(2.0, e) * (1 + s)
-        return base_value * (2.0 / (1.0 + self.gamma))
\ No newline at end of file
+        base_value = math.ldexp(1 + s, e)
+        return base_value * self.center_factor
@@ -6,14 +6,46 @@ This implementation approximates the memory-optimal logarithmic mapping by:
 2. Linearly interpolating the logarithm between consecutive powers of 2
 """
 
+import math
+import struct
 import numpy as np
 from .base import MappingScheme
+from ._kernels import linear_bucket_index
+
+_DOUBLE = struct.Struct('<d')
+_UINT64 = struct.Struct('<Q')
+_MANTISSA_MASK = (1 << 52) - 1
+_MANTISSA_SCALE = 1.0 / (1 << 52)
 
 class LinearInterpolationMapping(MappingScheme):
     def __init__(self, relative_accuracy: float):
         self.relative_accuracy = relative_accuracy
         self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
         self.log_gamma = np.log(self.gamma)
+        # Precomputed so the per-value paths multiply instead of divide
+        self.inv_log_gamma = 1.0 / self.log_gamma
+        self.center_factor = 2.0 / (1 + self.gamma)
+        self._specialize()
+        
+    def _specialize(self):
+        # Reconstructing a value costs several float ops per call; quantile
+        # queries revisit the same indices, so memoize it
+        self._memoize_values()
+        if linear_bucket_index is None:
+            return
+            
+        # Positive finite values go to the compiled kernel; anything else
+        # takes the reference method so errors are raised as before
+        reference = type(self).compute_bucket_index.__get__(self)
+        
+        def compute_bucket_index(value: float, _kernel=linear_bucket_index,
+                                 _inv_log_gamma=self.inv_log_gamma, _inf=math.inf,
+                                 _reference=reference) -> int:
+            if 0 < value < _inf:
+                return _kernel(value, _inv_log_gamma)
+            return _reference(value)
+        
+        self.compute_bucket_index = compute_bucket_index
         
     def _extract_exponent(self, value: float) -> tuple[int, float]:
         """
@@ -23,10 +55,19 @@ class LinearInterpolationMapping(MappingScheme):
             tuple: (exponent, normalized_fraction)
             where normalized_fraction is in [1, 2)
         """
-        # Use numpy's frexp for better numerical precision
-        mantissa, exponent = np.frexp(value) # mantissa * 2^exponent = value
-        exponent -= 1  # Convert to floor(log2)
-        normalized_fraction = mantissa * 2  # Scale to [1, 2)
+        # Reinterpret the IEEE 754 double as its 64-bit pattern and read the
+        # biased exponent (bits 52-62) and mantissa (bits 0-51) directly
+        bits = _UINT64.unpack(_DOUBLE.pack(value))[0]
+        biased_exponent = (bits >> 52) & 0x7FF
+        if biased_exponent == 0x7FF:
+            # All-ones exponent encodes inf and NaN, which have no bucket
+            raise ValueError(f"Value must be finite, got {value}")
+        if biased_exponent == 0:
+            # Subnormals have no implicit leading bit; let frexp normalize them
+            mantissa, exponent = math.frexp(value)
+            return exponent - 1, mantissa * 2
+        exponent = biased_exponent - 1023  # floor(log2)
+        normalized_fraction = 1.0 + (bits & _MANTISSA_MASK) * _MANTISSA_SCALE  # [1, 2)
         return exponent, normalized_fraction
         
     def compute_bucket_index(self, value: float) -> int:
@@ -42,7 +83,18 @@ class LinearInterpolationMapping(MappingScheme):
         
         # Compute final index
         log2_value = exponent + log2_fraction
-        return int(np.ceil(log2_value / self.log_gamma))
+        return math.ceil(log2_value * self.inv_log_gamma)
+    
+    def compute_bucket_indices(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        # inf would map to INT64_MIN once cast, so reject it with the rest
+        if not np.all(np.isfinite(values) & (values > 0)):
+            raise ValueError("Values must be positive and finite")
+            
+        # np.frexp is a ufunc, so the whole batch is decomposed in one call
+        mantissa, exponent = np.frexp(values)
+        log2_value = (exponent - 1) + (mantissa * 2 - 1)
+        return np.ceil(log2_value * self.inv_log_gamma).astype(np.int64)
         
     def compute_value_from_index(self, index: int) -> float:
         """
@@ -58,12 +110,22 @@ class LinearInterpolationMapping(MappingScheme):
         log2_value = index * self.log_gamma
         
         # Extract the integer and fractional parts of log2_value
-        exponent = int(np.floor(log2_value) + 1)
-        mantissa = (log2_value - exponent + 2) / 2.0
+        exponent = math.floor(log2_value) + 1
+        mantissa = (log2_value - exponent + 2) * 0.5
         
-        # Use ldexp to efficiently compute 2^exponent * mantissa
-        result = np.ldexp(mantissa, exponent)
+        # Use ldexp to efficiently compute 2^exponent * mantissa; unlike
+        # np.ldexp, math.ldexp raises past the float range
+        try:
+            result = math.ldexp(mantissa, exponent)
+        except OverflowError:
+            return math.inf
         
         # Apply the centering factor
-        return result * (2.0 / (1 + self.gamma))
-        
\ No newline at end of file
+        return result * self.center_factor
+        
+    
+    def compute_values_from_indices(self, indices: np.ndarray) -> np.ndarray:
+        log2_value = np.asarray(indices, dtype=np.int64) * self.log_gamma
+        exponent = np.floor(log2_value) + 1
+        mantissa = (log2_value - exponent + 2) * 0.5
+        return np.ldexp(mantissa, exponent.astype(np.int32)) * self.center_factor
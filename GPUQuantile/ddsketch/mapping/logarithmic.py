@@ -1,5 +1,6 @@
 """Logarithmic mapping scheme for DDSketch."""
 
+import math
 import numpy as np
 from .base import MappingScheme
 
@@ -7,15 +8,62 @@ class LogarithmicMapping(MappingScheme):
     def __init__(self, relative_accuracy: float):
         self.relative_accuracy = relative_accuracy
         self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
-        self.multiplier = 1 / np.log(self.gamma)
+        self.log_gamma = math.log(self.gamma)
+        self.multiplier = 1 / self.log_gamma  # Per-value paths multiply by this instead of dividing
+        self.center_factor = 2.0 / (1.0 + self.gamma)
+        self._specialize()
+        
+    def _specialize(self):
+        """
+        Bind per-instance versions of the mapping methods as closures.
+        
+        gamma is fixed after construction, so the constants and math
+        functions are bound as default arguments (fast locals) instead of
+        being looked up as attributes and globals on every call. The closures
+        shadow the class methods below, which remain the reference
+        implementation.
+        """
+        def compute_bucket_index(value: float, _multiplier=self.multiplier,
+                                 _log=math.log, _ceil=math.ceil) -> int:
+            if value <= 0:
+                raise ValueError(f"Value must be positive, got {value}")
+            return _ceil(_log(value) * _multiplier)
+        
+        def compute_value_from_index(index: int, _gamma=self.gamma,
+                                     _center_factor=self.center_factor, _inf=math.inf) -> float:
+            try:
+                return _gamma ** index * _center_factor
+            except OverflowError:
+                return _inf
+        
+        self.compute_bucket_index = compute_bucket_index
+        self.compute_value_from_index = compute_value_from_index
         
     def compute_bucket_index(self, value: float) -> int:
         if value <= 0:
             raise ValueError(f"Value must be positive, got {value}")
         # ceil(log_gamma(value) = ceil(log(value) / log(gamma))
-        return int(np.ceil(np.log(value) * self.multiplier))
+        # math.log/math.ceil avoid NumPy's ufunc dispatch on scalars
+        return math.ceil(math.log(value) * self.multiplier)
+    
+    def compute_bucket_indices(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        # inf would map to INT64_MIN once cast, so reject it with the rest
+        if not np.all(np.isfinite(values) & (values > 0)):
+            raise ValueError("Values must be positive and finite")
+        return np.ceil(np.log(values) * self.multiplier).astype(np.int64)
     
     def compute_value_from_index(self, index: int) -> float:
         # Return geometric mean of bucket boundaries
         # This ensures the relative error is bounded by relative_accuracy
-        return np.power(self.gamma, index) * (2.0 / (1.0 + self.gamma))
\ No newline at end of file
+        # float ** int is cheaper than math.exp on a single CPython float,
+        # but raises instead of returning inf past the float range
+        try:
+            return self.gamma ** index * self.center_factor
+        except OverflowError:
+            return math.inf
+    
+    def compute_values_from_indices(self, indices: np.ndarray) -> np.ndarray:
+        indices = np.asarray(indices, dtype=np.float64)
+        # exp of a product vectorizes far better than np.power on arrays
+        return np.exp(indices * self.log_gamma) * self.center_factor
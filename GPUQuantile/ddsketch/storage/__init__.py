@@ -4,7 +4,7 @@ Storage implementations for DDSketch algorithm.
 This module provides different storage strategies for DDSketch:
 
 - ContiguousStorage: Memory-efficient fixed-size array for a limited bucket range
-- SparseStorage: Hash-based structure for handling wider bucket ranges
+- SparseStorage: Sorted-array structure for handling wider bucket ranges
 - BucketManagementStrategy: Enumeration of strategies for handling bucket limitations
 
 All storage classes derive from the Storage base class and provide methods to add,
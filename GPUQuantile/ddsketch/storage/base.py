@@ -2,6 +2,7 @@
 
 from abc import ABC, abstractmethod
 from enum import Enum, auto
+from typing import Iterator, Optional, Tuple
 import numpy as np
 import warnings
 
@@ -42,14 +43,35 @@ class Storage(ABC):
             # Initialize with reasonable minimum for small counts
             self.max_buckets = 32
             
-        self.total_count = 0  # Used for dynamic strategy
+        self.total_count = 0  # Sum of all bucket counts, kept up to date by every mutation
         self.last_order_of_magnitude = 0  # Track last order of magnitude for dynamic updates
+        self._cumulative = None  # Cached (indices, cumulative counts), reset on mutation
         
     @abstractmethod
     def add(self, bucket_index: int, count: int = 1):
         """Add count to bucket_index."""
         pass
     
+    def add_many(self, bucket_indices: np.ndarray, counts: np.ndarray = None):
+        """
+        Add counts to many buckets at once.
+        
+        Subclasses override this with a vectorized implementation; the default
+        falls back to calling add once per bucket.
+        
+        Args:
+            bucket_indices: Array of bucket indices (duplicates are allowed).
+            counts: Array of counts aligned with bucket_indices (default 1 each).
+        """
+        bucket_indices = np.asarray(bucket_indices, dtype=np.int64)
+        if counts is None:
+            for bucket_index in bucket_indices.tolist():
+                self.add(bucket_index)
+        else:
+            counts = np.asarray(counts, dtype=np.int64)
+            for bucket_index, count in zip(bucket_indices.tolist(), counts.tolist()):
+                self.add(bucket_index, count)
+    
     @abstractmethod
     def remove(self, bucket_index: int, count: int = 1) -> bool:
         """
@@ -74,6 +96,64 @@ class Storage(ABC):
         """Merge another storage into this one."""
         pass
     
+    @abstractmethod
+    def _nonzero_buckets(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the non-empty bucket indices and their counts in ascending index order.
+        
+        The arrays may be views of the storage's own buffers and must not be
+        modified by the caller.
+        """
+    
+    def nnz(self) -> int:
+        """Get the number of non-empty buckets."""
+        return len(self._nonzero_buckets()[0])
+    
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """
+        Iterate over the non-empty buckets in ascending index order.
+        
+        Yields:
+            tuple: (bucket_index, count) pairs.
+        """
+        indices, counts = self._nonzero_buckets()
+        return zip(indices.tolist(), counts.tolist())
+    
+    def cumulative_counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the non-empty bucket indices together with their running counts.
+        
+        The prefix sum is cached and only rebuilt on the first call after the
+        storage has been mutated, so repeated quantile queries can locate a
+        rank with a binary search instead of walking the buckets.
+        
+        Returns:
+            tuple: (bucket_indices, cumulative_counts), both int64 arrays in
+            ascending bucket index order.
+        """
+        if self._cumulative is None:
+            indices, counts = self._nonzero_buckets()
+            self._cumulative = (indices, np.cumsum(counts, dtype=np.int64))
+        return self._cumulative
+    
+    def quantile_bucket(self, rank: float, side: str = 'right') -> Optional[int]:
+        """
+        Find the bucket that holds the given rank.
+        
+        Args:
+            rank: Target rank, counted from the lowest bucket.
+            side: 'right' returns the first bucket whose cumulative count
+                  exceeds rank, 'left' the first one that reaches it.
+            
+        Returns:
+            The bucket index, or None if rank lies beyond the last bucket.
+        """
+        indices, cumulative = self.cumulative_counts()
+        pos = int(np.searchsorted(cumulative, rank, side=side))
+        if pos < len(indices):
+            return int(indices[pos])
+        return None
+    
     def _should_update_dynamic_limit(self) -> bool:
         """Check if we should update the dynamic limit based on order of magnitude change."""
         if self.strategy != BucketManagementStrategy.DYNAMIC:
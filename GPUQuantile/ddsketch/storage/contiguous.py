@@ -1,52 +1,108 @@
 """Contiguous array storage implementation for DDSketch using circular buffer."""
 
+from typing import Tuple
 import numpy as np
 import warnings
 from .base import Storage, BucketManagementStrategy
 
+try:
+    from .._fastcore import bucket_add as _bucket_add
+    from .._fastcore import bucket_sub as _bucket_sub
+except ImportError:  # pragma: no cover - depends on the build
+    _bucket_add = _bucket_sub = None
+
+__all__ = ["ContiguousStorage"]
+
+
+def _wrap(pos: int, n: int) -> int:
+    """
+    Wrap a buffer position that lies less than one buffer length out of range.
+    
+    Positions are always the head plus an offset within the tracked range, so a
+    single conditional add or subtract replaces the integer division of pos % n.
+    """
+    if pos >= n:
+        return pos - n
+    if pos < 0:
+        return pos + n
+    return pos
+
 class ContiguousStorage(Storage):
     """
     Contiguous array storage for DDSketch using a circular buffer.
     
     Uses a bucket mapping scheme where:
-    bucket_array_index = (bucket_index - min_bucket_index + arr_index_of_min_bucket) % num_buckets
+    bucket_array_index = (bucket_index - min_bucket_index + arr_index_of_min_bucket) & (buffer_size - 1)
     
     Implements collapsing strategy where:
     - If inserting below min: collapse if range too large, otherwise adjust min
     - If inserting above max: collapse lowest buckets to make room
+    
+    The buffer is allocated lazily: it starts empty and doubles whenever the
+    tracked range outgrows it. Its length is always a power of two (at most
+    max_buckets rounded up), so positions wrap with a bitmask; max_buckets
+    remains the limit on the tracked range. Counts are stored in a compact
+    unsigned dtype and widened to int64 before they could overflow.
     """
     
-    def __init__(self, max_buckets: int = 2048):
+    INITIAL_CAPACITY = 32  # Buffer size allocated on first insertion
+    
+    def __init__(self, max_buckets: int = 2048, count_dtype: np.dtype = np.uint32):
         """
         Initialize contiguous storage.
         
         Args:
             max_buckets: Maximum number of buckets (default 2048).
+            count_dtype: Integer dtype of the count buffer (default uint32).
+                        Promoted to int64 once the total count no longer fits.
         """
         if max_buckets <= 0:
             raise ValueError("max_buckets must be positive for ContiguousStorage")
         super().__init__(max_buckets, BucketManagementStrategy.FIXED)
         self.total_count = 0
-        self.counts = np.zeros(max_buckets, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=count_dtype)  # Grown on demand by _ensure_capacity
+        self._max_capacity = 1 << (max_buckets - 1).bit_length()  # max_buckets rounded up to a power of two
+        self._mask = 0  # len(self.counts) - 1
+        self._count_limit = int(np.iinfo(count_dtype).max)
         self.min_index = None  # Minimum bucket index seen
         self.max_index = None  # Maximum bucket index seen
         self.num_buckets = 0   # Number of non-zero buckets
         self.arr_index_of_min_bucket = 0  # Array index where min bucket is stored
         self.collapse_count = 0  # Number of times buckets have been collapsed
     
-    def _get_position(self, bucket_index: int) -> int:
+    def _ensure_capacity(self, span: int):
         """
-        Get array position for bucket index using new mapping formula.
+        Grow the buffer so that it can hold span consecutive buckets.
+        
+        Growing unrolls the circular buffer so that the minimum bucket ends up
+        at position 0.
         
         Args:
-            bucket_index: The bucket index to map to array position.
-            
-        Returns:
-            The array position in the circular buffer.
+            span: Number of consecutive buckets that must fit (<= max_buckets).
         """
-        if self.min_index is None:
-            return 0
-        return (bucket_index - self.min_index + self.arr_index_of_min_bucket) % len(self.counts)
+        size = len(self.counts)
+        if span <= size:
+            return
+        new_size = max(size, min(self.INITIAL_CAPACITY, self._max_capacity))
+        while new_size < span:
+            new_size *= 2
+        grown = np.zeros(new_size, dtype=self.counts.dtype)
+        if self.min_index is not None:
+            live = self.get_counts_range()[0]
+            grown[:len(live)] = live
+        self.counts = grown
+        self._mask = new_size - 1
+        self.arr_index_of_min_bucket = 0
+    
+    def _widen_counts(self):
+        """
+        Promote the count buffer to int64.
+        
+        No bucket can hold more than total_count, so callers only need to
+        compare the running total against _count_limit to rule out overflow.
+        """
+        self.counts = self.counts.astype(np.int64)
+        self._count_limit = int(np.iinfo(np.int64).max)
     
     def add(self, bucket_index: int, count: int = 1):
         """
@@ -59,75 +115,154 @@ class ContiguousStorage(Storage):
         if count <= 0:
             return
             
-        if self.min_index is None:
+        self._cumulative = None
+        if self.total_count + count > self._count_limit:
+            self._widen_counts()
+        min_index = self.min_index
+        if min_index is not None and min_index <= bucket_index <= self.max_index:
+            # Steady state: insertion within the current range. The count is
+            # read once as a Python int and written back, which avoids the
+            # NumPy scalar round trips of a compare plus an in-place add.
+            # The occupancy check stays a branch on that int: a branchless
+            # num_buckets update or an occupancy bitmap measures slower here
+            counts = self.counts
+            pos = (bucket_index - min_index + self.arr_index_of_min_bucket) & self._mask
+            if _bucket_add is not None:
+                # Compiled read-modify-write through a typed pointer
+                if _bucket_add(counts, pos, count) == 0:
+                    self.num_buckets += 1
+            else:
+                old_count = counts.item(pos)
+                if old_count == 0:
+                    self.num_buckets += 1
+                counts[pos] = old_count + count
+        elif min_index is None:
             # First insertion
+            self._ensure_capacity(1)
             self.min_index = bucket_index
             self.max_index = bucket_index
             self.counts[0] = count
             self.num_buckets = 1
             self.arr_index_of_min_bucket = 0
-        else:
-            if bucket_index < self.min_index:
-                new_range = self.max_index - bucket_index + 1
-                # Handle insertion below current minimum
-                if new_range > len(self.counts):
-                    # Range too large, collapse into min bucket
-                    pos = self._get_position(self.min_index)
-                    self.counts[pos] += count
-                    self.collapse_count += 1
-                else:
-                    # Update min and place value
-                    shift = self.min_index - bucket_index
-                    self.min_index = bucket_index
-                    self.arr_index_of_min_bucket = self.arr_index_of_min_bucket - shift
-                    pos = self._get_position(bucket_index)
-                    self.counts[pos] = count
-                    self.num_buckets += 1
-                    
-            elif bucket_index > self.max_index:
-                new_range = bucket_index - self.min_index + 1
-                if new_range > len(self.counts):
-                    # Handle insertion above current maximum
-                    buckets_to_collapse = bucket_index - self.max_index
-                    # Collapse lowest buckets
-                    collapse_sum = 0
-                    for i in range(buckets_to_collapse):
-                        if i >= self.max_index - self.min_index + 1:
-                            warnings.warn("Collapsing all buckets in the sketch. "
-                                          "Range is too large to be contained by the buckets allocated, "
-                                          "and you should increase max_buckets.", UserWarning)
-                            break
-                        pos = i + self.arr_index_of_min_bucket
-                        collapse_sum += self.counts[pos]
-                        self.counts[pos] = 0
-                        
-                    # Add collapsed values to new min bucket
-                    new_min = self.min_index + buckets_to_collapse
-                    new_min_pos = self._get_position(new_min)
-                    self.counts[new_min_pos] += collapse_sum
-                    
-                    # Update tracking variables
-                    self.min_index = new_min
-                    self.arr_index_of_min_bucket = new_min_pos
-                    self.collapse_count += buckets_to_collapse
+        elif bucket_index < self.min_index:
+            new_range = self.max_index - bucket_index + 1
+            # Handle insertion below current minimum
+            if new_range > self.max_buckets:
+                # Range too large, collapse into min bucket (stored at the head)
+                self.counts[self.arr_index_of_min_bucket] += count
+                self.collapse_count += 1
+            else:
+                # Update min and place value
+                self._ensure_capacity(new_range)
+                shift = self.min_index - bucket_index
+                self.min_index = bucket_index
+                self.arr_index_of_min_bucket = _wrap(self.arr_index_of_min_bucket - shift, len(self.counts))
+                self.counts[self.arr_index_of_min_bucket] = count
+                self.num_buckets += 1
                 
-                # Place new value
-                self.max_index = bucket_index
-                pos = self._get_position(bucket_index)
-                was_zero = self.counts[pos] == 0
-                self.counts[pos] += count
-                if was_zero:
-                    self.num_buckets += 1
+        else:
+            # Insertion above current maximum. The new head, range and bucket
+            # position are worked out in locals and committed once
+            counts = self.counts
+            mask = self._mask
+            head = self.arr_index_of_min_bucket
+            new_min = self.min_index
+            new_range = bucket_index - new_min + 1
+            if new_range > self.max_buckets:
+                # Range too large, collapse lowest buckets to make room
+                buckets_to_collapse = bucket_index - self.max_index
+                span = self.max_index - self.min_index + 1
+                if buckets_to_collapse > span:
+                    warnings.warn("Collapsing all buckets in the sketch. "
+                                  "Range is too large to be contained by the buckets allocated, "
+                                  "and you should increase max_buckets.", UserWarning)
+                # Fold the lowest buckets into the new minimum with one
+                # gather/clear; buckets_to_collapse can exceed the buffer
+                # length here, which the mask handles as well
+                positions = (np.arange(min(buckets_to_collapse, span)) + head) & mask
+                collapsed = counts[positions]
+                collapse_sum = int(collapsed.sum())
+                self.num_buckets -= int(np.count_nonzero(collapsed))
+                counts[positions] = 0
+                new_min += buckets_to_collapse
+                head = (head + buckets_to_collapse) & mask
+                if collapse_sum:
+                    if counts[head] == 0:
+                        self.num_buckets += 1
+                    counts[head] += collapse_sum
+                self.collapse_count += buckets_to_collapse
             else:
-                # Normal insertion within current range
-                pos = self._get_position(bucket_index)
-                was_zero = self.counts[pos] == 0
-                self.counts[pos] += count
-                if was_zero:
-                    self.num_buckets += 1
-                    
+                self._ensure_capacity(new_range)
+                counts = self.counts
+                mask = self._mask
+                head = self.arr_index_of_min_bucket
+            
+            # Place new value at its offset from the head
+            pos = (head + bucket_index - new_min) & mask
+            if counts[pos] == 0:
+                self.num_buckets += 1
+            counts[pos] += count
+            self.min_index = new_min
+            self.max_index = bucket_index
+            self.arr_index_of_min_bucket = head
+                
         self.total_count += count
     
+    def add_many(self, bucket_indices: np.ndarray, counts: np.ndarray = None):
+        """
+        Add counts to many buckets at once.
+        
+        If the batch fits in the buffer together with the current range, it is
+        added in bulk: unit counts are histogrammed over the batch's span with
+        np.bincount and added as one dense run, explicit counts are scattered
+        with np.add.at. Otherwise the buckets are added one by one so that the
+        collapsing strategy applies.
+        
+        Args:
+            bucket_indices: Array of bucket indices (duplicates are allowed).
+            counts: Array of counts aligned with bucket_indices (default 1 each).
+        """
+        bucket_indices = np.asarray(bucket_indices, dtype=np.int64)
+        if counts is not None:
+            counts = np.asarray(counts, dtype=np.int64)
+            keep = counts > 0
+            if not keep.all():
+                bucket_indices, counts = bucket_indices[keep], counts[keep]
+        if len(bucket_indices) == 0:
+            return
+            
+        lo = int(bucket_indices.min())
+        total = len(bucket_indices) if counts is None else int(counts.sum())
+        if self.reserve(lo, int(bucket_indices.max()), total):
+            if counts is None:
+                self._add_run(lo, np.bincount(bucket_indices - lo))
+            else:
+                positions = (bucket_indices - self.min_index + self.arr_index_of_min_bucket) & self._mask
+                np.add.at(self.counts, positions, counts)
+            self.record_raw_add(total)
+            return
+            
+        super().add_many(bucket_indices, counts)
+    
+    def _add_run(self, bucket_index: int, run: np.ndarray):
+        """
+        Add counts for consecutive buckets starting at bucket_index.
+        
+        The run must lie within the tracked range, so it occupies at most two
+        contiguous slices of the circular buffer.
+        
+        Args:
+            bucket_index: Bucket index of run[0].
+            run: Counts for buckets bucket_index, bucket_index + 1, ...
+        """
+        start = (bucket_index - self.min_index + self.arr_index_of_min_bucket) & self._mask
+        first = min(len(run), len(self.counts) - start)
+        target = self.counts[start:start + first]
+        np.add(target, run[:first], out=target, casting='unsafe')
+        if first < len(run):
+            target = self.counts[:len(run) - first]
+            np.add(target, run[first:], out=target, casting='unsafe')
+    
     def remove(self, bucket_index: int, count: int = 1) -> bool:
         """
         Remove count from bucket_index.
@@ -139,39 +274,46 @@ class ContiguousStorage(Storage):
         Returns:
             bool: True if any value was actually removed, False otherwise.
         """
-        if count <= 0 or self.min_index is None:
+        min_index = self.min_index
+        if count <= 0 or min_index is None:
             return False
             
-        if self.min_index <= bucket_index <= self.max_index:
-            pos = self._get_position(bucket_index)
-            old_count = self.counts[pos]
+        if min_index <= bucket_index <= self.max_index:
+            counts = self.counts
+            pos = (bucket_index - min_index + self.arr_index_of_min_bucket) & self._mask
+            if _bucket_sub is not None:
+                # Saturating compiled subtraction; a no-op on an empty bucket
+                old_count = _bucket_sub(counts, pos, count)
+            else:
+                old_count = counts.item(pos)
             
             if old_count == 0:
                 return False
                 
-            self.counts[pos] = max(0, old_count - count)
-            self.total_count = max(0, self.total_count - count)
+            self._cumulative = None
+            removed = count if count < old_count else old_count
+            if _bucket_sub is None:
+                counts[pos] = old_count - removed
+            self.total_count -= removed
             
-            if old_count > 0 and self.counts[pos] == 0:
+            if removed == old_count:
                 self.num_buckets -= 1
                 if self.num_buckets == 0:
                     self.min_index = None
                     self.max_index = None
-                elif bucket_index == self.min_index:
-                    # Find new minimum index
-                    for i in range(self.max_index - self.min_index + 1):
-                        pos = (self.arr_index_of_min_bucket + i) % len(self.counts)
-                        if self.counts[pos] > 0:
-                            self.min_index += i
-                            self.arr_index_of_min_bucket = pos
-                            break
-                elif bucket_index == self.max_index:
-                    # Find new maximum index
-                    for i in range(self.max_index - self.min_index + 1):
-                        pos = (self.arr_index_of_min_bucket + (self.max_index - self.min_index - i)) % len(self.counts)
-                        if self.counts[pos] > 0:
-                            self.max_index -= i
-                            break
+                elif bucket_index == self.min_index or bucket_index == self.max_index:
+                    # An end of the range emptied: find the new ends with one
+                    # vectorized scan over the occupied range
+                    occupied = np.flatnonzero(self.get_counts_range()[0])
+                    if len(occupied) == 0:
+                        self.num_buckets = 0
+                        self.min_index = None
+                        self.max_index = None
+                    else:
+                        first, last = int(occupied[0]), int(occupied[-1])
+                        self.arr_index_of_min_bucket = (self.arr_index_of_min_bucket + first) & self._mask
+                        self.max_index = self.min_index + last
+                        self.min_index += first
             return True
         else:
             warnings.warn("Removing count from non-existent bucket. "
@@ -188,26 +330,135 @@ class ContiguousStorage(Storage):
         Returns:
             The count at the specified bucket index.
         """
-        if self.min_index is None or bucket_index < self.min_index or bucket_index > self.max_index:
+        min_index = self.min_index
+        if min_index is None or bucket_index < min_index or bucket_index > self.max_index:
             warnings.warn("Bucket index is out of range. Returning 0.", UserWarning)
             return 0
-        pos = self._get_position(bucket_index)
-        return int(self.counts[pos])
+        return self.counts.item((bucket_index - min_index + self.arr_index_of_min_bucket) & self._mask)
+    
+    def get_counts_range(self) -> Tuple[np.ndarray, int]:
+        """
+        Get the counts of the tracked bucket range in ascending index order.
+        
+        The range occupies at most two contiguous slices of the circular
+        buffer, which are gathered into one array without any index arithmetic.
+        
+        Returns:
+            tuple: (counts, min_index), where counts[i] is the count of bucket
+            min_index + i. counts is empty and min_index is 0 if the storage
+            is empty.
+        """
+        if self.min_index is None:
+            return np.empty(0, dtype=self.counts.dtype), 0
+        span = self.max_index - self.min_index + 1
+        head = self.arr_index_of_min_bucket
+        first = min(span, len(self.counts) - head)
+        return (np.concatenate((self.counts[head:head + first], self.counts[:span - first])),
+                self.min_index)
+    
+    def raw_array(self) -> np.ndarray:
+        """
+        Return the underlying circular count buffer without copying.
+        
+        Bucket bucket_index lives at position
+        (bucket_index - min_index + arr_index_of_min_bucket) & (len(buffer) - 1).
+        Callers writing into the buffer must first call reserve() and
+        afterwards record_raw_add().
+        """
+        return self.counts
     
-    def merge(self, other: 'ContiguousStorage'):
+    def reserve(self, min_index: int, max_index: int, count: int = 0) -> bool:
+        """
+        Extend the tracked bucket range to cover [min_index, max_index].
+        
+        The range is only extended if it fits in the buffer without collapsing.
+        The caller must then add a non-zero count to both min_index and
+        max_index so that the range bounds refer to non-empty buckets.
+        
+        Args:
+            min_index: Lowest bucket index to reserve.
+            max_index: Highest bucket index to reserve.
+            count: Total count the caller is about to add, so that the count
+                   dtype can be widened before it overflows.
+            
+        Returns:
+            bool: True if the range is now covered, False if it would not fit.
+        """
+        if self.total_count + count > self._count_limit:
+            self._widen_counts()
+        if self.min_index is None:
+            if max_index - min_index + 1 > self.max_buckets:
+                return False
+            self._ensure_capacity(max_index - min_index + 1)
+            self.min_index = min_index
+            self.max_index = max_index
+            self.arr_index_of_min_bucket = 0
+            return True
+            
+        new_min = min(min_index, self.min_index)
+        new_max = max(max_index, self.max_index)
+        if new_max - new_min + 1 > self.max_buckets:
+            return False
+        self._ensure_capacity(new_max - new_min + 1)
+        self.arr_index_of_min_bucket = _wrap(
+            self.arr_index_of_min_bucket - (self.min_index - new_min), len(self.counts)
+        )
+        self.min_index = new_min
+        self.max_index = new_max
+        return True
+    
+    def record_raw_add(self, count: int):
+        """
+        Update bookkeeping after count values were written through raw_array().
+        
+        Args:
+            count: The total count added to the buffer.
+        """
+        self._cumulative = None
+        self.total_count += count
+        self.num_buckets = int(np.count_nonzero(self.counts))
+    
+    def nnz(self) -> int:
+        """Get the number of non-empty buckets."""
+        # Positions outside the tracked range are always zero
+        return int(np.count_nonzero(self.counts))
+    
+    def _nonzero_buckets(self) -> Tuple[np.ndarray, np.ndarray]:
+        counts, min_index = self.get_counts_range()
+        offsets = np.flatnonzero(counts)
+        return offsets + min_index, counts[offsets]
+    
+    def merge(self, other: Storage):
         """
         Merge another storage into this one.
         
+        A ContiguousStorage is merged buffer to buffer. Any other storage only
+        contributes its non-empty buckets, which are scattered into the buffer
+        by add_many.
+        
         Args:
-            other: Another ContiguousStorage instance to merge with this one.
+            other: Another storage instance to merge with this one.
         """
+        if not isinstance(other, ContiguousStorage):
+            self.add_many(*other._nonzero_buckets())
+            return
         if other.min_index is None:
             return
             
-        # Add each non-zero bucket
-        for i in range(other.max_index - other.min_index + 1):
-            pos = (other.arr_index_of_min_bucket + i) % len(other.counts)
-            if other.counts[pos] > 0:
-                bucket_index = other.min_index + i
-                self.add(bucket_index, int(other.counts[pos]))
+        if self.reserve(other.min_index, other.max_index, other.total_count):
+            # Both ranges fit in the buffer. The source range occupies at most
+            # two contiguous runs of other's buffer, each added with slice adds
+            span = other.max_index - other.min_index + 1
+            src = other.arr_index_of_min_bucket
+            first = min(span, len(other.counts) - src)
+            self._add_run(other.min_index, other.counts[src:src + first])
+            if first < span:
+                self._add_run(other.min_index + first, other.counts[:span - first])
+            self.record_raw_add(other.total_count)
+            return
+            
+        # Ranges too far apart: add bucket by bucket so the collapsing logic applies
+        indices, counts = other._nonzero_buckets()
+        for bucket_index, count in zip(indices.tolist(), counts.tolist()):
+            self.add(bucket_index, count)
     
\ No newline at end of file
@@ -1,17 +1,36 @@
-"""Sparse storage implementation for DDSketch using dictionary."""
+"""Sparse storage implementation for DDSketch using sorted parallel arrays."""
 
-from typing import Dict
+import heapq
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+import numpy as np
 from .base import Storage, BucketManagementStrategy
 
+# Shared by every empty storage; read-only since arrays are only ever replaced
+_EMPTY = np.empty(0, dtype=np.int64)
+_EMPTY.flags.writeable = False
+
 class SparseStorage(Storage):
     """
-    Sparse storage for DDSketch using dictionary.
+    Sparse storage for DDSketch using sorted parallel arrays.
     
     This implementation is memory-efficient for sparse data where bucket indices
     are widely spread. It only stores non-zero counts and has no constraints
     on the range of bucket indices.
+    
+    Buckets are kept as a structure of arrays: _indices holds the non-empty
+    bucket indices in ascending order and _counts the matching counts, so
+    lookups are binary searches and merges are vectorized.
+    
+    Single adds are first collected in a small dict and merged into the
+    arrays in bulk, either when it fills up or before anything reads the
+    buckets. Adds are only deferred while they cannot push the storage past
+    its bucket limit, so collapsing happens exactly as if every add had been
+    applied immediately.
     """
     
+    PENDING_CAPACITY = 64  # Deferred buckets held before merging into the arrays
+    
     def __init__(self, max_buckets: int = 2048,
                  strategy: BucketManagementStrategy = BucketManagementStrategy.FIXED):
         """
@@ -23,9 +42,78 @@ class SparseStorage(Storage):
             strategy: Bucket management strategy (default FIXED).
         """
         super().__init__(max_buckets, strategy)
-        self.counts: Dict[int, int] = {}
-        self.min_index = None  # Minimum bucket index seen
-        self.max_index = None  # Maximum bucket index seen
+        self._indices = _EMPTY  # Sorted non-empty bucket indices
+        self._counts = _EMPTY   # Counts aligned with _indices
+        self._pending = {}  # Deferred adds {bucket_index: count}, see _flush
+        self._bloom = None  # (indices, 64-bit membership mask) of _indices, see get_count
+    
+    @property
+    def counts(self) -> Mapping[int, int]:
+        """
+        Read-only snapshot of the non-empty buckets as {bucket_index: count}.
+        
+        Buckets live in sorted arrays rather than a dict, so writing through
+        this mapping could not update the storage; it raises TypeError
+        instead of silently dropping the write. Use add and remove.
+        """
+        self._flush()
+        return MappingProxyType(dict(zip(self._indices.tolist(), self._counts.tolist())))
+    
+    @property
+    def min_index(self) -> Optional[int]:
+        """Minimum non-empty bucket index, or None if the storage is empty."""
+        self._flush()
+        return int(self._indices[0]) if len(self._indices) else None
+    
+    @property
+    def max_index(self) -> Optional[int]:
+        """Maximum non-empty bucket index, or None if the storage is empty."""
+        self._flush()
+        return int(self._indices[-1]) if len(self._indices) else None
+    
+    def _flush(self):
+        """
+        Merge the deferred adds into the sorted arrays.
+        
+        The deferred bucket indices are unique, so existing buckets are
+        updated with one fancy-indexed add and new ones placed with a single
+        scatter into grown arrays. Small sketches typically hold all their
+        buckets in the dict until the first read, in which case the sorted
+        dict contents simply become the arrays. Totals and limits were
+        already handled by add.
+        """
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = {}
+        keys = np.fromiter(pending.keys(), dtype=np.int64, count=len(pending))
+        counts = np.fromiter(pending.values(), dtype=np.int64, count=len(pending))
+        order = np.argsort(keys)
+        keys, counts = keys[order], counts[order]
+        if len(self._indices) == 0:
+            self._indices, self._counts = keys, counts
+            return
+        
+        pos = np.searchsorted(self._indices, keys)
+        found = np.zeros(len(keys), dtype=bool)
+        inside = pos < len(self._indices)
+        found[inside] = self._indices[pos[inside]] == keys[inside]
+        self._counts[pos[found]] += counts[found]
+        new = ~found
+        num_new = int(np.count_nonzero(new))
+        if num_new:
+            # Output positions of the new buckets: their insertion point
+            # shifted by the new buckets placed before them
+            placed = pos[new] + np.arange(num_new)
+            is_new = np.zeros(len(self._indices) + num_new, dtype=bool)
+            is_new[placed] = True
+            indices = np.empty(len(is_new), dtype=np.int64)
+            merged_counts = np.empty(len(is_new), dtype=np.int64)
+            indices[placed] = keys[new]
+            merged_counts[placed] = counts[new]
+            indices[~is_new] = self._indices
+            merged_counts[~is_new] = self._counts
+            self._indices, self._counts = indices, merged_counts
     
     def add(self, bucket_index: int, count: int = 1):
         """
@@ -38,21 +126,70 @@ class SparseStorage(Storage):
         if count <= 0:
             return
             
-        self.counts[bucket_index] = self.counts.get(bucket_index, 0) + count
+        self._cumulative = None
         self.total_count += count
+        if self.strategy == BucketManagementStrategy.DYNAMIC:
+            self._update_dynamic_limit()
+            
+        # Defer the add while the arrays plus the deferred buckets cannot
+        # exceed the limit; only removals lower a dynamic limit, and they flush
+        pending = self._pending
+        if bucket_index in pending:
+            pending[bucket_index] += count
+            return
+        if (self.strategy == BucketManagementStrategy.UNLIMITED or
+            len(self._indices) + len(pending) < self.max_buckets):
+            pending[bucket_index] = count
+            if len(pending) >= self.PENDING_CAPACITY:
+                self._flush()
+            return
+            
+        self._flush()
+        pos = int(np.searchsorted(self._indices, bucket_index))
+        if pos < len(self._indices) and self._indices[pos] == bucket_index:
+            self._counts[pos] += count
+        else:
+            self._indices = np.insert(self._indices, pos, bucket_index)
+            self._counts = np.insert(self._counts, pos, count)
+            
+        if len(self._indices) > self.max_buckets:
+            self.collapse_smallest_buckets()
+    
+    def add_many(self, bucket_indices: np.ndarray, counts: np.ndarray = None):
+        """
+        Add counts to many buckets at once.
         
-        # Update min and max indices
-        if self.min_index is None or bucket_index < self.min_index:
-            self.min_index = bucket_index
-        if self.max_index is None or bucket_index > self.max_index:
-            self.max_index = bucket_index
+        Args:
+            bucket_indices: Array of bucket indices (duplicates are allowed).
+            counts: Array of counts aligned with bucket_indices (default 1 each).
+        """
+        bucket_indices = np.asarray(bucket_indices, dtype=np.int64)
+        if counts is None:
+            counts = np.ones(len(bucket_indices), dtype=np.int64)
+        else:
+            counts = np.asarray(counts, dtype=np.int64)
+            keep = counts > 0
+            if not keep.all():
+                bucket_indices, counts = bucket_indices[keep], counts[keep]
+        if len(bucket_indices) == 0:
+            return
+            
+        self._cumulative = None
+        self._flush()
+        # Align both sides on the union of indices and add them in one pass
+        merged = np.union1d(self._indices, bucket_indices)
+        merged_counts = np.zeros(len(merged), dtype=np.int64)
+        merged_counts[np.searchsorted(merged, self._indices)] += self._counts
+        np.add.at(merged_counts, np.searchsorted(merged, bucket_indices), counts)
+        self._indices = merged
+        self._counts = merged_counts
+        self.total_count += int(counts.sum())
         
         if self.strategy == BucketManagementStrategy.DYNAMIC:
             self._update_dynamic_limit()
             
-        if (self.strategy != BucketManagementStrategy.UNLIMITED and 
-            len(self.counts) > self.max_buckets):
-            self.collapse_smallest_buckets()
+        if self.strategy != BucketManagementStrategy.UNLIMITED:
+            self._collapse_to_limit()
     
     def remove(self, bucket_index: int, count: int = 1) -> bool:
         """
@@ -65,23 +202,22 @@ class SparseStorage(Storage):
         Returns:
             bool: True if any value was actually removed, False otherwise.
         """
-        if count <= 0 or bucket_index not in self.counts:
+        if count <= 0:
+            return False
+        self._flush()
+        pos = int(np.searchsorted(self._indices, bucket_index))
+        if pos == len(self._indices) or self._indices[pos] != bucket_index:
             return False
             
-        self.counts[bucket_index] = max(0, self.counts[bucket_index] - count)
-        self.total_count = max(0, self.total_count - count)
-        
-        if self.counts[bucket_index] == 0:
-            del self.counts[bucket_index]
-            # Update min and max indices if needed
-            if bucket_index == self.min_index or bucket_index == self.max_index:
-                if not self.counts:  # If no buckets left
-                    self.min_index = None
-                    self.max_index = None
-                else:
-                    # Recalculate min and max
-                    self.min_index = min(self.counts.keys())
-                    self.max_index = max(self.counts.keys())
+        self._cumulative = None
+        old_count = self._counts.item(pos)
+        removed = count if count < old_count else old_count
+        self._counts[pos] = old_count - removed
+        self.total_count -= removed
+        
+        if removed == old_count:
+            self._indices = np.delete(self._indices, pos)
+            self._counts = np.delete(self._counts, pos)
             
         return True
     
@@ -95,32 +231,112 @@ class SparseStorage(Storage):
         Returns:
             The count at the specified bucket index.
         """
-        return self.counts.get(bucket_index, 0)
+        # Deferred adds are looked up where they are instead of being merged,
+        # so alternating adds and reads do not force a merge per read; a
+        # bucket may have counts both pending and in the arrays
+        count = self._pending.get(bucket_index, 0)
+        indices = self._indices
+        if len(indices) < 64:
+            # Small storages answer most absent buckets with a 64-bit filter
+            # that has bit (index & 63) set for every stored index. Past 63
+            # indices it would be mostly ones, so it is skipped. _indices is
+            # only ever replaced, never modified in place, so the filter is
+            # rebuilt whenever it no longer refers to the current array
+            bloom = self._bloom
+            if bloom is None or bloom[0] is not indices:
+                bits = np.left_shift(np.uint64(1), (indices & 63).astype(np.uint64))
+                bloom = self._bloom = (indices, int(np.bitwise_or.reduce(bits)))
+            if not (bloom[1] >> (int(bucket_index) & 63)) & 1:
+                return count
+        pos = int(np.searchsorted(indices, bucket_index))
+        if pos < len(indices) and indices[pos] == bucket_index:
+            count += int(self._counts[pos])
+        return count
+    
+    def nnz(self) -> int:
+        """Get the number of non-empty buckets."""
+        # Emptied buckets are deleted, so every stored bucket is non-empty
+        self._flush()
+        return len(self._indices)
+    
+    def _nonzero_buckets(self) -> Tuple[np.ndarray, np.ndarray]:
+        # _indices and _counts are already the sorted non-empty buckets
+        self._flush()
+        return self._indices, self._counts
     
-    def merge(self, other: 'SparseStorage'):
+    def merge(self, other: Storage):
         """
         Merge another storage into this one.
         
+        Only the non-empty buckets of other are merged, so a dense storage
+        never has to be expanded bucket by bucket.
+        
         Args:
-            other: Another SparseStorage instance to merge with this one.
+            other: Another storage instance to merge with this one.
         """
-        for idx, count in other.counts.items():
-            self.add(idx, count)
-            
+        self.add_many(*other._nonzero_buckets())
+    
     def collapse_smallest_buckets(self):
         """Collapse the two buckets with smallest counts to maintain max bucket limit."""
-        if len(self.counts) < 2:
+        self._flush()
+        if len(self._indices) < 2:
             return
             
-        # Find two buckets with smallest counts
-        sorted_buckets = sorted(self.counts.items(), key=lambda x: (x[1], x[0]))
-        i0, count0 = sorted_buckets[0]
-        i1, count1 = sorted_buckets[1]
-        
-        # Ensure i0 is the smaller index for consistency
-        if i1 < i0:
-            i0, i1 = i1, i0
-        
-        # Merge buckets
-        self.counts[i1] += self.counts[i0]
-        del self.counts[i0] 
\ No newline at end of file
+        # Find the two buckets with smallest counts, ties broken by lowest
+        # index, with two linear argmin scans rather than a full sort.
+        # argmin returns the first minimum, i.e. the lowest bucket index
+        counts = self._counts
+        first = int(np.argmin(counts))
+        first_count = counts[first]
+        counts[first] = np.iinfo(counts.dtype).max
+        second = int(np.argmin(counts))
+        counts[first] = first_count
+        p0, p1 = sorted((first, second))
+        
+        # Merge the lower-index bucket into the higher-index one
+        self._cumulative = None
+        self._counts[p1] += self._counts[p0]
+        self._indices = np.delete(self._indices, p0)
+        self._counts = np.delete(self._counts, p0)
+    
+    def _collapse_to_limit(self):
+        """
+        Collapse buckets in bulk until at most max_buckets remain.
+        
+        Equivalent to calling collapse_smallest_buckets once per excess
+        bucket: each step merges the two smallest buckets, ordered by count
+        and then index, into the higher-index one. k steps consume at most
+        2k of the original buckets, and always the smallest ones first, so
+        only those are selected with a partition and the steps run on a
+        small heap instead of rescanning the arrays each time.
+        """
+        self._flush()
+        counts = self._counts
+        excess = min(len(counts) - self.max_buckets, len(counts) - 1)
+        if excess <= 0:
+            return
+        size = min(2 * excess, len(counts))
+        
+        # Buckets strictly below the size-th smallest count, topped up with
+        # the lowest-index buckets holding exactly that count
+        threshold = np.partition(counts, size - 1)[size - 1]
+        below = np.flatnonzero(counts < threshold)
+        tied = np.flatnonzero(counts == threshold)[:size - len(below)]
+        selected = np.concatenate((below, tied))
+        selected = selected[np.lexsort((selected, counts[selected]))]
+        
+        # Sorted (count, position) pairs already form a valid heap
+        heap = list(zip(counts[selected].tolist(), selected.tolist()))
+        keep = np.ones(len(counts), dtype=bool)
+        for _ in range(excess):
+            first_count, first = heapq.heappop(heap)
+            second_count, second = heapq.heappop(heap)
+            low, high = (first, second) if first < second else (second, first)
+            keep[low] = False
+            heapq.heappush(heap, (first_count + second_count, high))
+        merged_counts, merged = zip(*heap)
+        counts[list(merged)] = merged_counts
+        
+        self._cumulative = None
+        self._indices = self._indices[keep]
+        self._counts = counts[keep]
@@ -28,11 +28,11 @@ def test_mapping(mapping_class, alpha=0.01):
     mapping = mapping_class(alpha)
     
     # Test various values
-    test_values = [0.1, 1.0, 5.0, 10.0, 100.0, 1000.0]
-    for value in test_values:
-        bucket = mapping.compute_bucket_index(value)
-        back_value = mapping.compute_value_from_index(bucket)
-        rel_error = abs(back_value - value) / value
+    test_values = np.array([0.1, 1.0, 5.0, 10.0, 100.0, 1000.0])
+    buckets = mapping.compute_bucket_indices(test_values)
+    back_values = mapping.compute_values_from_indices(buckets)
+    rel_errors = np.abs(back_values - test_values) / test_values
+    for value, bucket, back_value, rel_error in zip(test_values, buckets, back_values, rel_errors):
         print(f"Value: {value:10.4g} -> Bucket: {bucket:4d} -> Value: {back_value:10.4g}, Rel Error: {rel_error:8.6f}")
         # Check if error is within alpha
         if rel_error > alpha:
@@ -40,10 +40,11 @@ def test_mapping(mapping_class, alpha=0.01):
             
     # Test extreme values
     print("\nExtreme values:")
-    for value in [1e-10, 1e-5, 1e5, 1e10]:
-        bucket = mapping.compute_bucket_index(value)
-        back_value = mapping.compute_value_from_index(bucket)
-        rel_error = abs(back_value - value) / value
+    test_values = np.array([1e-10, 1e-5, 1e5, 1e10])
+    buckets = mapping.compute_bucket_indices(test_values)
+    back_values = mapping.compute_values_from_indices(buckets)
+    rel_errors = np.abs(back_values - test_values) / test_values
+    for value, bucket, back_value, rel_error in zip(test_values, buckets, back_values, rel_errors):
         print(f"Value: {value:10.4g} -> Bucket: {bucket:8d} -> Value: {back_value:10.4g}, Rel Error: {rel_error:8.6f}")
 
 def test_sketch():
@@ -68,11 +69,11 @@ def test_sketch():
     # Print internal state
     print("\nInternal state:")
     print(f"Count: {sketch.count}")
-    print(f"Min: {sketch.min_value}, Max: {sketch.max_value}")
+    print(f"Min bucket: {sketch.positive_store.min_index}, Max bucket: {sketch.positive_store.max_index}")
     
     # Print buckets
     print("\nPositive store buckets:")
-    for idx, count in sketch._get_specific_storage_items(sketch.positive_store):
+    for idx, count in sketch.positive_store.items():
         value = sketch.mapping.compute_value_from_index(idx)
         print(f"Bucket {idx}: Count={count}, Value={value:.4f}")
 
@@ -22,6 +22,9 @@ INSTALL_REQUIRES = [
   "scipy",
   "matplotlib",
 ]
+EXTRAS_REQUIRE = {
+  "numba": ["numba"],
+}
 ENTRY_POINTS = {
   
 }
@@ -31,6 +34,25 @@ SCRIPTS = [
 
 HERE = os.path.dirname(__file__)
 
+def ext_modules():
+  # The compiled kernels are optional: without Cython the package falls back
+  # to the Numba/NumPy implementations at runtime
+  try:
+    import numpy
+    from Cython.Build import cythonize
+  except ImportError:
+    return []
+  return cythonize([
+    setuptools.Extension(
+      "GPUQuantile.ddsketch._fastcore",
+      ["GPUQuantile/ddsketch/_fastcore.pyx"],
+      include_dirs=[numpy.get_include()],
+      define_macros=[("NPY_NO_DEPRECATED_API", "NPY_1_7_API_VERSION")],
+      # No fused multiply-adds, so the mapping kernels round like Python does
+      extra_compile_args=[] if os.name == "nt" else ["-ffp-contract=off"],
+    ),
+  ])
+
 def read(file):
   with open(os.path.join(HERE, file), "r") as fh:
     return fh.read()
@@ -56,6 +78,8 @@ if __name__ == "__main__":
     url=URL,
     classifiers=CLASSIFIERS,
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
+    ext_modules=ext_modules(),
     entry_points=ENTRY_POINTS,
     scripts=SCRIPTS,
     include_package_data=True    
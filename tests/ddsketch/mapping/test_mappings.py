@@ -1,13 +1,16 @@
+import functools
+import pickle
 import pytest
+import numpy as np
 from GPUQuantile.ddsketch.mapping.logarithmic import LogarithmicMapping
 from GPUQuantile.ddsketch.mapping.linear_interpolation import LinearInterpolationMapping
 from GPUQuantile.ddsketch.mapping.cubic_interpolation import CubicInterpolationMapping
 
-@pytest.fixture(params=[0.01, 0.001, 0.1])
+@pytest.fixture(scope="module", params=[0.01, 0.001, 0.1])
 def relative_accuracy(request):
     return request.param
 
-@pytest.fixture(params=[
+@pytest.fixture(scope="module", params=[
     LogarithmicMapping,
     LinearInterpolationMapping,
     CubicInterpolationMapping
@@ -15,20 +18,25 @@ def relative_accuracy(request):
 def mapping_class(request):
     return request.param
 
+@functools.lru_cache(maxsize=None)
+def _mapping(cls, relative_accuracy):
+    """Shared mapping instance; tests that inspect per-instance caches build their own."""
+    return cls(relative_accuracy)
+
 def test_mapping_initialization(mapping_class, relative_accuracy):
-    mapping = mapping_class(relative_accuracy)
+    mapping = _mapping(mapping_class, relative_accuracy)
     assert mapping.relative_accuracy == relative_accuracy
 
 def test_bucket_index_monotonicity(mapping_class, relative_accuracy):
-    mapping = mapping_class(relative_accuracy)
-    values = [1.0, 2.0, 3.0, 4.0, 5.0]
-    indices = [mapping.compute_bucket_index(v) for v in values]
+    mapping = _mapping(mapping_class, relative_accuracy)
+    values = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    indices = mapping.compute_bucket_indices(values)
     
     # Check that indices are monotonically increasing
-    assert all(indices[i] <= indices[i+1] for i in range(len(indices)-1))
+    assert np.all(np.diff(indices) >= 0)
 
 def test_value_reconstruction(mapping_class, relative_accuracy):
-    mapping = mapping_class(relative_accuracy)
+    mapping = _mapping(mapping_class, relative_accuracy)
     test_values = [0.1, 1.0, 10.0, 100.0]
     
     for value in test_values:
@@ -45,21 +53,21 @@ def test_value_reconstruction(mapping_class, relative_accuracy):
         assert relative_error <= relative_accuracy + epsilon, f"Relative error {relative_error} exceeds bound {relative_accuracy} for value {value}"
 
 def test_negative_values(mapping_class, relative_accuracy):
-    mapping = mapping_class(relative_accuracy)
+    mapping = _mapping(mapping_class, relative_accuracy)
     
     # Negative values should raise ValueError
     with pytest.raises(ValueError):
         mapping.compute_bucket_index(-1.0)
 
 def test_zero_value(mapping_class, relative_accuracy):
-    mapping = mapping_class(relative_accuracy)
+    mapping = _mapping(mapping_class, relative_accuracy)
     
     # Zero should raise ValueError
     with pytest.raises(ValueError):
         mapping.compute_bucket_index(0.0)
 
 def test_extreme_values(mapping_class, relative_accuracy):
-    mapping = mapping_class(relative_accuracy)
+    mapping = _mapping(mapping_class, relative_accuracy)
     
     # Test very small and very large values
     small_value = 1e-100
@@ -89,7 +97,7 @@ def test_extreme_values(mapping_class, relative_accuracy):
         f"Large value: {large_value}, reconstructed: {large_reconstructed}, relative error: {abs(large_reconstructed - large_value) / large_value}"
 
 def test_consecutive_buckets(mapping_class, relative_accuracy):
-    mapping = mapping_class(relative_accuracy)
+    mapping = _mapping(mapping_class, relative_accuracy)
     
     # Test that consecutive bucket indices give values within relative accuracy
     value = 1.0
@@ -119,6 +127,7 @@ def test_specific_mapping_features():
     log_mapping = LogarithmicMapping(0.01)
     assert hasattr(log_mapping, 'gamma')
     assert log_mapping.gamma > 1
+    assert log_mapping.multiplier * log_mapping.log_gamma == pytest.approx(1.0)
     
     # Test LinearInterpolationMapping
     lin_mapping = LinearInterpolationMapping(0.01)
@@ -131,6 +140,10 @@ def test_specific_mapping_features():
     assert hasattr(cubic_mapping, 'B')
     assert hasattr(cubic_mapping, 'C')
     
+    # Cubic reconstruction returns plain floats and saturates to inf
+    assert type(cubic_mapping.compute_value_from_index(10)) is float
+    assert cubic_mapping.compute_value_from_index(10**6) == float('inf')
+    
     # Test that each mapping type gives different results
     test_value = 2.0
     log_index = log_mapping.compute_bucket_index(test_value)
@@ -138,21 +151,93 @@ def test_specific_mapping_features():
     cubic_index = cubic_mapping.compute_bucket_index(test_value)
     
     # The indices should be different due to different mapping strategies
-    assert len({log_index, lin_index, cubic_index}) > 1
+    assert not (log_index == lin_index == cubic_index)
 
 def test_mapping_consistency(mapping_class, relative_accuracy):
     """Test that mapping is consistent across multiple calls"""
-    mapping = mapping_class(relative_accuracy)
+    mapping = _mapping(mapping_class, relative_accuracy)
     
     # Test multiple calls with same value
     value = 1.234
-    indices = [mapping.compute_bucket_index(value) for _ in range(10)]
+    indices = np.fromiter((mapping.compute_bucket_index(value) for _ in range(10)),
+                          dtype=np.int64, count=10)
     
     # All indices should be identical
-    assert len(set(indices)) == 1
+    assert np.all(indices == indices[0])
     
     # Test reconstruction is consistent
-    reconstructions = [mapping.compute_value_from_index(indices[0]) for _ in range(10)]
+    reconstructions = np.fromiter((mapping.compute_value_from_index(int(indices[0])) for _ in range(10)),
+                                  dtype=np.float64, count=10)
     
     # All reconstructions should be identical
-    assert len(set(reconstructions)) == 1 
\ No newline at end of file
+    assert np.all(reconstructions == reconstructions[0])
+
+def test_compute_bucket_indices(mapping_class, relative_accuracy):
+    """Test that the vectorized mapping agrees with the scalar one"""
+    mapping = _mapping(mapping_class, relative_accuracy)
+    values = np.array([1e-100, 0.1, 0.5, 1.0, 1.234, 2.0, 10.0, 100.0, 1e100])
+    
+    indices = mapping.compute_bucket_indices(values)
+    
+    assert indices.dtype == np.int64
+    assert indices.tolist() == [mapping.compute_bucket_index(v) for v in values]
+    
+    with pytest.raises(ValueError):
+        mapping.compute_bucket_indices(np.array([1.0, 0.0]))
+
+def test_compute_values_from_indices(mapping_class, relative_accuracy):
+    """Test that the vectorized inverse mapping agrees with the scalar one"""
+    mapping = _mapping(mapping_class, relative_accuracy)
+    indices = mapping.compute_bucket_indices(np.array([1e-10, 0.1, 1.0, 1.234, 100.0, 1e10]))
+    
+    values = mapping.compute_values_from_indices(indices)
+    
+    assert values.dtype == np.float64
+    np.testing.assert_allclose(values, [mapping.compute_value_from_index(i) for i in indices.tolist()],
+                               rtol=1e-12)
+
+def test_mapping_pickle(mapping_class, relative_accuracy):
+    """Test that mappings survive a pickle round trip, e.g. through multiprocessing"""
+    mapping = _mapping(mapping_class, relative_accuracy)
+    restored = pickle.loads(pickle.dumps(mapping))
+    
+    for value in [0.1, 1.0, 1.234, 100.0]:
+        index = mapping.compute_bucket_index(value)
+        assert restored.compute_bucket_index(value) == index
+        assert restored.compute_value_from_index(index) == mapping.compute_value_from_index(index)
+
+@pytest.mark.parametrize("mapping_class", [LinearInterpolationMapping, CubicInterpolationMapping])
+def test_compiled_bucket_index_matches_reference(mapping_class, relative_accuracy):
+    """Test that the per-instance (possibly compiled) index path agrees with the class method"""
+    mapping = _mapping(mapping_class, relative_accuracy)
+    reference = type(mapping).compute_bucket_index
+    np.random.seed(0)
+    values = np.concatenate([10.0 ** np.random.uniform(-300, 300, 500),
+                             [5e-324, 1e-310, 0.5, 1.0, 2.0, 3.0, 1.7976931348623157e308]])
+    
+    for value in values.tolist():
+        assert mapping.compute_bucket_index(value) == reference(mapping, value)
+    
+    # Invalid values are still rejected by the reference implementation
+    for value in [0.0, -1.0]:
+        with pytest.raises(ValueError):
+            mapping.compute_bucket_index(value)
+    # Non-finite values have no bucket either (the cubic mapping fails in
+    # int conversion, as it always has)
+    for value in [float('inf'), float('nan')]:
+        with pytest.raises((ValueError, OverflowError)):
+            mapping.compute_bucket_index(value)
+        with pytest.raises((ValueError, OverflowError)):
+            reference(mapping, value)
+
+@pytest.mark.parametrize("mapping_class", [LinearInterpolationMapping, CubicInterpolationMapping])
+def test_value_from_index_memoized(mapping_class):
+    """Test that interpolated mappings cache reconstructed values"""
+    mapping = mapping_class(0.01)
+    first = mapping.compute_value_from_index(42)
+    assert mapping.compute_value_from_index(42) == first
+    assert mapping.compute_value_from_index.cache_info().hits == 1
+    
+    # The cache is per instance
+    other = mapping_class(0.05)
+    assert other.compute_value_from_index(42) != first
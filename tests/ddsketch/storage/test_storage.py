@@ -5,7 +5,7 @@ from GPUQuantile.ddsketch.storage.sparse import SparseStorage
 import warnings
 import numpy as np
 
-@pytest.fixture(params=[ContiguousStorage, SparseStorage])
+@pytest.fixture(scope="module", params=[ContiguousStorage, SparseStorage])
 def storage_class(request):
     return request.param
 
@@ -89,6 +89,12 @@ def test_remove(storage_class, max_buckets, bucket_strategy):
     storage.remove(bucket_idx)
     
     assert storage.get_count(bucket_idx) == 1
+    assert storage.total_count == 1
+    
+    # Removing more than a bucket holds only subtracts what was there
+    storage.add(7)
+    storage.remove(bucket_idx, 5)
+    assert storage.total_count == 1
     
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
@@ -139,12 +145,8 @@ def test_bucket_limit(storage_class, max_buckets, bucket_strategy):
         storage.add(i)
     
     # Count total non-zero buckets
-    if storage_class == ContiguousStorage:
-        # For ContiguousStorage, count physical storage buckets
-        non_zero_buckets = sum(1 for count in storage.counts if count > 0)
-    else:
-        # For other storage types, count logical buckets
-        non_zero_buckets = sum(1 for i in range(max_buckets + 10) if storage.get_count(i) > 0)
+    non_zero_buckets = storage.nnz()
+    assert non_zero_buckets == len(list(storage.items()))
     
     if bucket_strategy == BucketManagementStrategy.FIXED:
         # FIXED strategy should respect max_buckets exactly
@@ -264,4 +266,298 @@ def test_unlimited_strategy_warning():
     # No warning should be raised when using default max_buckets
     with warnings.catch_warnings():
         warnings.simplefilter("error")  # Turn warnings into errors
-        SparseStorage(strategy=BucketManagementStrategy.UNLIMITED)  # Just create without assigning 
\ No newline at end of file
+        SparseStorage(strategy=BucketManagementStrategy.UNLIMITED)  # Just create without assigning 
+
+
+def test_contiguous_storage_reserve():
+    """Test reserving a bucket range and writing through the raw buffer"""
+    storage = ContiguousStorage(max_buckets=32)
+    storage.add(10)
+    
+    # Range that fits is reserved without collapsing
+    assert storage.reserve(0, 20)
+    assert storage.min_index == 0
+    assert storage.max_index == 20
+    
+    counts = storage.raw_array()
+    counts[(0 - storage.min_index + storage.arr_index_of_min_bucket) % len(counts)] += 1
+    counts[(20 - storage.min_index + storage.arr_index_of_min_bucket) % len(counts)] += 1
+    storage.record_raw_add(2)
+    
+    assert storage.get_count(0) == 1
+    assert storage.get_count(10) == 1
+    assert storage.get_count(20) == 1
+    assert storage.total_count == 3
+    assert storage.num_buckets == 3
+    
+    # Range wider than the buffer is rejected and leaves the storage untouched
+    assert not storage.reserve(-100, 20)
+    assert storage.min_index == 0
+
+def test_contiguous_storage_lazy_allocation():
+    """Test that the buffer starts empty and grows up to max_buckets"""
+    storage = ContiguousStorage(max_buckets=256)
+    assert len(storage.raw_array()) == 0
+    
+    storage.add(10)
+    assert len(storage.raw_array()) == ContiguousStorage.INITIAL_CAPACITY
+    
+    # Growing below the minimum keeps every bucket in place
+    storage.add(-40, 2)
+    storage.add(100, 3)
+    assert len(storage.raw_array()) == 256
+    assert storage.get_count(10) == 1
+    assert storage.get_count(-40) == 2
+    assert storage.get_count(100) == 3
+    assert storage.total_count == 6
+    
+    # The buffer never grows past max_buckets
+    storage.add(1000)
+    assert len(storage.raw_array()) == 256
+
+def test_contiguous_storage_collapse_bookkeeping():
+    """Test that collapsing keeps num_buckets in sync with the buffer"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        storage = ContiguousStorage(max_buckets=8)
+        for bucket in [0, 2, 3, 7, 10, 40]:
+            storage.add(bucket)
+            assert storage.num_buckets == np.count_nonzero(storage.raw_array())
+    
+    assert storage.total_count == 6
+    assert storage.max_index == 40
+
+def test_contiguous_storage_power_of_two_buffer():
+    """Test that the buffer length is a power of two while max_buckets bounds the range"""
+    storage = ContiguousStorage(max_buckets=100)
+    for bucket in range(0, 200, 3):
+        storage.add(bucket)
+    
+    assert len(storage.raw_array()) == 128
+    assert storage.max_index - storage.min_index + 1 <= 100
+    assert storage.total_count == len(range(0, 200, 3))
+
+def test_contiguous_storage_count_dtype():
+    """Test that compact count buffers are widened before they overflow"""
+    storage = ContiguousStorage(max_buckets=8)
+    storage.add(1)
+    assert storage.raw_array().dtype == np.uint32
+    
+    storage = ContiguousStorage(max_buckets=8, count_dtype=np.uint16)
+    storage.add(1, 65535)
+    assert storage.raw_array().dtype == np.uint16
+    storage.add(1)
+    assert storage.raw_array().dtype == np.int64
+    assert storage.get_count(1) == 65536
+    
+    # Bulk paths widen as well
+    other = ContiguousStorage(max_buckets=8, count_dtype=np.uint16)
+    other.add_many(np.array([2, 3]), np.array([40000, 40000]))
+    assert other.raw_array().dtype == np.int64
+    merged = ContiguousStorage(max_buckets=8, count_dtype=np.uint16)
+    merged.add(2, 60000)
+    merged.merge(other)
+    assert merged.get_count(2) == 100000
+    assert merged.total_count == 140000
+    
+    # Removing more than a bucket holds must not wrap around
+    storage.remove(1, 70000)
+    assert storage.total_count == 0
+
+def test_cumulative_counts(storage_class):
+    """Test the cached prefix sum used by quantile queries"""
+    storage = storage_class(64)
+    for bucket, count in [(3, 2), (-2, 1), (7, 4)]:
+        storage.add(bucket, count)
+    
+    assert list(storage.items()) == [(-2, 1), (3, 2), (7, 4)]
+    indices, cumulative = storage.cumulative_counts()
+    assert indices.tolist() == [-2, 3, 7]
+    assert cumulative.tolist() == [1, 3, 7]
+    
+    # The cache is reused until the storage is mutated
+    assert storage.cumulative_counts()[1] is cumulative
+    storage.remove(3, 2)
+    indices, cumulative = storage.cumulative_counts()
+    assert indices.tolist() == [-2, 7]
+    assert cumulative.tolist() == [1, 5]
+    
+    # Rank lookups go through the same prefix sum
+    assert storage.quantile_bucket(0) == -2
+    assert storage.quantile_bucket(1) == 7
+    assert storage.quantile_bucket(1, side='left') == -2
+    assert storage.quantile_bucket(5) is None
+
+def test_sparse_storage_add_many():
+    """Test bulk insertion into SparseStorage"""
+    storage = SparseStorage(strategy=BucketManagementStrategy.UNLIMITED)
+    storage.add(5, 2)
+    storage.add_many(np.array([5, -3, 10, -3]), np.array([1, 1, 4, 2]))
+    
+    assert storage.counts == {-3: 3, 5: 3, 10: 4}
+    assert storage.total_count == 10
+    
+    # counts is a read-only snapshot; writes must go through add/remove
+    with pytest.raises(TypeError):
+        storage.counts[5] += 1
+    assert storage.get_count(5) == 3
+    assert storage.min_index == -3
+    assert storage.max_index == 10
+    
+    # Bulk insertion still honours the bucket limit
+    limited = SparseStorage(max_buckets=8)
+    limited.add_many(np.arange(20), np.ones(20, dtype=np.int64))
+    assert len(limited.counts) <= 8
+    assert limited.total_count == 20
+
+def test_contiguous_storage_add_many():
+    """Test bulk insertion into ContiguousStorage"""
+    storage = ContiguousStorage(max_buckets=8)
+    storage.add(3)
+    storage.add_many(np.array([4, 1, 4, 2], dtype=np.int64))
+    storage.add_many(np.array([1, 6]), np.array([2, 3]))
+    
+    assert storage.min_index == 1
+    assert storage.max_index == 6
+    assert storage.total_count == 10
+    assert [storage.get_count(i) for i in range(1, 7)] == [3, 1, 1, 2, 0, 3]
+    
+    # Batches wider than the buffer fall back to collapsing per bucket
+    storage.add_many(np.arange(20, dtype=np.int64))
+    assert storage.total_count == 30
+    assert storage.max_index - storage.min_index < 8
+
+def test_contiguous_storage_merge_wrapped():
+    """Test bulk merge between buffers whose minimum buckets sit at different positions"""
+    storage1 = ContiguousStorage(max_buckets=8)
+    storage2 = ContiguousStorage(max_buckets=8)
+    
+    # Inserting below the minimum wraps the circular buffer head
+    for bucket in [4, 2, 0]:
+        storage1.add(bucket)
+    for bucket in [3, 6, 1]:
+        storage2.add(bucket, 2)
+    
+    storage1.merge(storage2)
+    
+    expected = {0: 1, 1: 2, 2: 1, 3: 2, 4: 1, 6: 2}
+    for bucket in range(7):
+        assert storage1.get_count(bucket) == expected.get(bucket, 0)
+    assert storage1.total_count == 9
+    assert storage1.num_buckets == 6
+
+def test_contiguous_storage_get_counts_range():
+    """Test gathering the tracked range out of a wrapped circular buffer"""
+    storage = ContiguousStorage(max_buckets=8)
+    counts, min_index = storage.get_counts_range()
+    assert len(counts) == 0
+    
+    # Inserting below the minimum moves the head so the range wraps around
+    for bucket, count in [(4, 1), (6, 3), (1, 2)]:
+        storage.add(bucket, count)
+    counts, min_index = storage.get_counts_range()
+    assert min_index == 1
+    assert counts.tolist() == [2, 0, 0, 1, 0, 3]
+    
+    # Quantile lookup on the gathered counts
+    assert min_index + int(np.searchsorted(np.cumsum(counts), 3)) == 4
+
+def test_sparse_storage_deferred_adds():
+    """Test that deferring single adds does not change bucket contents or collapsing"""
+    np.random.seed(0)
+    buckets = np.random.randint(-50, 50, 2000).tolist()
+    for strategy, max_buckets in [(BucketManagementStrategy.FIXED, 40), (BucketManagementStrategy.DYNAMIC, 2048)]:
+        deferred = SparseStorage(max_buckets, strategy)
+        eager = SparseStorage(max_buckets, strategy)
+        eager.PENDING_CAPACITY = 1  # Merge every add into the arrays immediately
+        
+        for i, bucket in enumerate(buckets):
+            deferred.add(bucket)
+            eager.add(bucket)
+            if i % 500 == 499:
+                assert deferred.counts == eager.counts
+        
+        assert deferred.total_count == eager.total_count == len(buckets)
+        assert deferred.counts == eager.counts
+
+def test_sparse_storage_get_count_filter():
+    """Test that get_count stays exact as the absent-bucket filter is rebuilt"""
+    storage = SparseStorage(max_buckets=16)
+    storage.add_many(np.arange(10))
+    assert storage.get_count(5) == 1
+    assert storage.get_count(69) == 0  # Same filter bit as 5
+    assert storage.get_count(30) == 0
+    
+    storage.add(30, 2)
+    storage.add(-1)
+    storage.add(5)  # Deferred on top of the count already in the arrays
+    assert storage._pending
+    assert storage.get_count(30) == 2
+    assert storage.get_count(-1) == 1
+    assert storage.get_count(5) == 2
+    
+    storage.remove(30, 2)
+    assert storage.get_count(30) == 0
+    
+    # Collapsing replaces the arrays as well
+    storage.add_many(np.arange(100, 120))
+    assert sum(storage.get_count(i) for i in range(-1, 120)) == storage.total_count
+
+def test_merge_dense_and_sparse():
+    """Test merging between contiguous and sparse storages in both directions"""
+    dense = ContiguousStorage(max_buckets=64)
+    sparse = SparseStorage(strategy=BucketManagementStrategy.UNLIMITED)
+    for bucket, count in [(3, 2), (10, 1), (-4, 5)]:
+        dense.add(bucket, count)
+    for bucket, count in [(10, 4), (20, 1), (-8, 2)]:
+        sparse.add(bucket, count)
+    expected = {-8: 2, -4: 5, 3: 2, 10: 5, 20: 1}
+    
+    merged_sparse = SparseStorage(strategy=BucketManagementStrategy.UNLIMITED)
+    merged_sparse.merge(sparse)
+    merged_sparse.merge(dense)
+    assert merged_sparse.counts == expected
+    assert merged_sparse.total_count == 15
+    
+    dense.merge(sparse)
+    assert dict(dense.items()) == expected
+    assert dense.total_count == 15
+    assert dense.num_buckets == 5
+
+@pytest.mark.parametrize("count_dtype", [np.uint16, np.uint32, np.uint64, np.int32, np.int64, np.int16])
+def test_contiguous_storage_single_bucket_updates(count_dtype):
+    """Test in-range add/remove for every count dtype, compiled or not"""
+    storage = ContiguousStorage(max_buckets=16, count_dtype=count_dtype)
+    storage.add(1)
+    storage.add(3, 5)
+    storage.add(3, 2)
+    assert storage.get_count(3) == 7
+    assert storage.num_buckets == 2
+    
+    # Removal saturates at the bucket's count
+    assert storage.remove(3, 10)
+    assert storage.get_count(3) == 0
+    assert storage.total_count == 1
+    assert storage.num_buckets == 1
+    assert storage.max_index == 1
+
+def test_sparse_storage_bulk_collapse():
+    """Test that bulk collapsing matches repeated pairwise collapsing"""
+    np.random.seed(3)
+    for excess in [1, 2, 5, 20]:
+        for _ in range(20):
+            indices = np.unique(np.random.randint(-100, 100, 30))
+            counts = np.random.randint(1, 4, len(indices))  # Plenty of ties
+            bulk = SparseStorage(max_buckets=len(indices) - excess)
+            pairwise = SparseStorage(strategy=BucketManagementStrategy.UNLIMITED)
+            pairwise.add_many(indices, counts)
+            for _ in range(excess):
+                pairwise.collapse_smallest_buckets()
+            bulk.add_many(indices, counts)
+            assert bulk.counts == pairwise.counts
+    
+    # Many excess buckets are collapsed at once down to the limit
+    storage = SparseStorage(max_buckets=10)
+    storage.add_many(np.arange(1000), np.random.randint(1, 100, 1000))
+    assert len(storage.counts) == 10
+    assert sum(storage.counts.values()) == storage.total_count
@@ -1,6 +1,8 @@
+import sys
 import pytest
 import numpy as np
 import warnings
+from GPUQuantile.ddsketch import _kernels
 from GPUQuantile.ddsketch.core import DDSketch
 from GPUQuantile.ddsketch.storage.base import BucketManagementStrategy
 
@@ -21,8 +23,7 @@ def test_ddsketch_initialization():
 def test_insert_positive():
     sketch = DDSketch(relative_accuracy=0.01)
     values = [1.0, 2.0, 3.0, 4.0, 5.0]
-    for v in values:
-        sketch.insert(v)
+    sketch.insert_many(values)
     assert sketch.count == len(values)
     
     # Test median (should be approximately 3.0)
@@ -40,6 +41,17 @@ def test_insert_negative():
     # Use a slightly higher tolerance for test stability
     assert abs(sketch.quantile(0.5) - (-3.0)) <= abs(-3.0) * 0.02  # Double the relative accuracy for tests
 
+def test_negative_quantiles_with_gaps():
+    for strategy in [BucketManagementStrategy.FIXED, BucketManagementStrategy.DYNAMIC]:
+        sketch = DDSketch(relative_accuracy=0.01, bucket_strategy=strategy)
+        values = [-1.0, -100.0, -100.0, -1e4, 5.0]
+        for v in values:
+            sketch.insert(v)
+        
+        # Negative buckets are far apart; ranks must land on the occupied ones
+        for q, expected in [(0.0, -1e4), (0.25, -100.0), (0.5, -100.0), (0.75, -1.0), (1.0, 5.0)]:
+            assert abs(sketch.quantile(q) - expected) <= abs(expected) * 0.02
+
 def test_insert_mixed():
     sketch = DDSketch(relative_accuracy=0.01)
     values = [-2.0, -1.0, 0.0, 1.0, 2.0]
@@ -51,6 +63,20 @@ def test_insert_mixed():
     # Test median (should be approximately 0.0)
     assert abs(sketch.quantile(0.5)) <= 0.02  # Use a fixed small error for zero median
 
+def test_insert_repeated_values():
+    sketch = DDSketch(relative_accuracy=0.01)
+    values = [2.0, 2.0, -2.0, -2.0, 2.0, 7.5, 7.5, -7.5]
+    for v in values:
+        sketch.insert(v)
+    
+    # Repeats reuse the cached bucket index but still land in the right store
+    index = sketch.mapping.compute_bucket_index
+    assert sketch.positive_store.get_count(index(2.0)) == 3
+    assert sketch.negative_store.get_count(index(2.0)) == 2
+    assert sketch.positive_store.get_count(index(7.5)) == 2
+    assert sketch.negative_store.get_count(index(7.5)) == 1
+    assert sketch.count == len(values)
+
 def test_negative_values_disabled():
     sketch = DDSketch(relative_accuracy=0.01, cont_neg=False)
     sketch.insert(1.0)  # Should work
@@ -98,10 +124,8 @@ def test_merge():
     true_median = values[median_idx]
 
     # Split values between sketches
-    for v in values[:median_idx]:
-        sketch1.insert(v)
-    for v in values[median_idx:]:
-        sketch2.insert(v)
+    sketch1.insert_many(values[:median_idx])
+    sketch2.insert_many(values[median_idx:])
 
     # Merge sketch2 into sketch1
     sketch1.merge(sketch2)
@@ -118,6 +142,24 @@ def test_merge():
     assert abs(sketch1.quantile(0.25) - true_q1) <= true_q1 * 0.01  # Q1
     assert abs(sketch1.quantile(0.75) - true_q3) <= true_q3 * 0.01  # Q3
 
+def test_merge_different_bucket_strategies():
+    np.random.seed(7)
+    values = np.random.lognormal(0, 2, 1000) * np.random.choice([-1, 1], 1000)
+    reference = DDSketch(relative_accuracy=0.01)
+    reference.insert_many(values)
+    
+    for first, second in [(BucketManagementStrategy.FIXED, BucketManagementStrategy.UNLIMITED),
+                          (BucketManagementStrategy.DYNAMIC, BucketManagementStrategy.FIXED)]:
+        sketch1 = DDSketch(relative_accuracy=0.01, bucket_strategy=first)
+        sketch2 = DDSketch(relative_accuracy=0.01, bucket_strategy=second)
+        sketch1.insert_many(values[:400])
+        sketch2.insert_many(values[400:])
+        sketch1.merge(sketch2)
+        
+        assert sketch1.count == len(values)
+        for q in [0.0, 0.1, 0.5, 0.9, 1.0]:
+            assert sketch1.quantile(q) == reference.quantile(q)
+
 def test_merge_incompatible():
     sketch1 = DDSketch(relative_accuracy=0.01)
     sketch2 = DDSketch(relative_accuracy=0.02)
@@ -125,6 +167,30 @@ def test_merge_incompatible():
     with pytest.raises(ValueError):
         sketch1.merge(sketch2)
 
+def test_merge_negative_into_positive_only():
+    for strategy in [BucketManagementStrategy.FIXED, BucketManagementStrategy.DYNAMIC]:
+        sketch1 = DDSketch(relative_accuracy=0.01, bucket_strategy=strategy, cont_neg=False)
+        sketch2 = DDSketch(relative_accuracy=0.01, bucket_strategy=strategy)
+        sketch2.insert(5.0)
+        sketch1.merge(sketch2)  # Empty negative store is fine
+        
+        sketch2.insert(-5.0)
+        with pytest.raises(ValueError):
+            sketch1.merge(sketch2)
+
+def test_count_dtype():
+    for count_dtype in [np.int32, np.uint16]:
+        sketch = DDSketch(relative_accuracy=0.01, count_dtype=count_dtype)
+        sketch.insert_many(np.full(70000, 2.0))
+        sketch.insert(-1.0)
+        
+        # uint16 is widened before 70000 could overflow it
+        expected = np.int64 if np.iinfo(count_dtype).max < 70000 else count_dtype
+        assert sketch.positive_store.raw_array().dtype == np.dtype(expected)
+        assert sketch.positive_store.total_count == 70000
+        assert sketch.negative_store.raw_array().dtype == np.dtype(count_dtype)
+        assert abs(sketch.quantile(0.5) - 2.0) <= 2.0 * 0.01
+
 def test_different_mapping_types():
     values = [1.0, 2.0, 3.0, 4.0, 5.0]
     
@@ -193,6 +259,17 @@ def test_extreme_values():
     assert q0 >= 0.1 * 0.9  # Allow for relative accuracy
     assert q1 <= 100.0 * 1.1  # Allow for relative accuracy
 
+def test_quantile_near_float_max(mapping_type):
+    """Test that buckets past the float range reconstruct to inf instead of raising"""
+    sketch = DDSketch(relative_accuracy=0.01, mapping_type=mapping_type)
+    value = sys.float_info.max * 0.995
+    sketch.insert(value)
+    
+    result = sketch.quantile(0.5)
+    assert result == float('inf') or abs(result - value) / value <= 0.01
+    last_index = sketch.mapping.compute_bucket_index(value)
+    assert sketch.mapping.compute_value_from_index(last_index + 5) == float('inf')
+
 def test_accuracy_guarantee():
     # Test that the relative error guarantee is maintained using a slightly higher tolerance
     # for test stability across different platforms
@@ -203,8 +280,7 @@ def test_accuracy_guarantee():
     values = np.random.lognormal(0, 1, 1000)
     
     # Insert values
-    for v in values:
-        sketch.insert(v)
+    sketch.insert_many(values)
     
     # Test various quantiles with a slightly relaxed tolerance
     test_tolerance = 0.02  # Doubled from 0.01 for test stability
@@ -214,4 +290,96 @@ def test_accuracy_guarantee():
         
         # Verify relative error is within tolerance
         relative_error = abs(approx_quantile - true_quantile) / true_quantile
-        assert relative_error <= test_tolerance, f"Relative error exceeded at q={q}" 
\ No newline at end of file
+        assert relative_error <= test_tolerance, f"Relative error exceeded at q={q}" 
+
+def test_insert_many_matches_insert(mapping_type):
+    np.random.seed(42)
+    values = np.concatenate([
+        np.random.lognormal(0, 1, 500),
+        -np.random.lognormal(0, 1, 500),
+        np.zeros(10)
+    ])
+    
+    batch_sketch = DDSketch(relative_accuracy=0.01, mapping_type=mapping_type)
+    scalar_sketch = DDSketch(relative_accuracy=0.01, mapping_type=mapping_type)
+    batch_sketch.insert_many(values)
+    for v in values:
+        scalar_sketch.insert(v)
+    
+    assert batch_sketch.count == scalar_sketch.count == len(values)
+    assert batch_sketch.zero_count == scalar_sketch.zero_count == 10
+    for q in [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0]:
+        assert batch_sketch.quantile(q) == scalar_sketch.quantile(q)
+
+def test_insert_many_duplicates_and_spread(mapping_type):
+    np.random.seed(7)
+    # Heavily duplicated values and values spanning far more buckets than
+    # there are values take different deduplication paths
+    for values in [np.repeat([1.5, 2.0, 300.0], 200), 10.0 ** np.random.uniform(-30, 30, 50)]:
+        batch_sketch = DDSketch(relative_accuracy=0.01, mapping_type=mapping_type,
+                                bucket_strategy=BucketManagementStrategy.UNLIMITED)
+        scalar_sketch = DDSketch(relative_accuracy=0.01, mapping_type=mapping_type,
+                                 bucket_strategy=BucketManagementStrategy.UNLIMITED)
+        batch_sketch.insert_many(values)
+        for v in values:
+            scalar_sketch.insert(v)
+        
+        assert batch_sketch.positive_store.counts == scalar_sketch.positive_store.counts
+        for q in [0.0, 0.25, 0.5, 0.75, 1.0]:
+            assert batch_sketch.quantile(q) == scalar_sketch.quantile(q)
+
+def test_insert_many_fast_backend_matches_numpy():
+    np.random.seed(3)
+    values = np.random.lognormal(0, 2, 2000)
+    
+    fast_sketch = DDSketch(relative_accuracy=0.01, use_fast_backend=True)
+    numpy_sketch = DDSketch(relative_accuracy=0.01, use_fast_backend=False)
+    fast_sketch.insert_many(values)
+    numpy_sketch.insert_many(values)
+    
+    assert fast_sketch.positive_store.total_count == numpy_sketch.positive_store.total_count
+    for q in [0.0, 0.01, 0.25, 0.5, 0.75, 0.99, 1.0]:
+        assert fast_sketch.quantile(q) == numpy_sketch.quantile(q)
+
+@pytest.mark.skipif(not _kernels.FASTCORE_AVAILABLE, reason="compiled extension not built")
+@pytest.mark.parametrize("count_dtype", [np.int8, np.int16, np.int32, np.int64,
+                                         np.uint8, np.uint16, np.uint32, np.uint64])
+def test_insert_many_fast_backend_count_dtypes(count_dtype):
+    """Test that the compiled batch kernel accepts every integer count dtype"""
+    np.random.seed(4)
+    values = np.random.lognormal(0, 1, 100)  # Fits int8 without widening
+    
+    fast_sketch = DDSketch(relative_accuracy=0.01, count_dtype=count_dtype)
+    numpy_sketch = DDSketch(relative_accuracy=0.01, use_fast_backend=False)
+    fast_sketch.insert_many(values)
+    numpy_sketch.insert_many(values)
+    
+    assert fast_sketch.positive_store.total_count == values.size
+    assert list(fast_sketch.positive_store.items()) == list(numpy_sketch.positive_store.items())
+    for q in [0.0, 0.5, 1.0]:
+        assert fast_sketch.quantile(q) == numpy_sketch.quantile(q)
+
+@pytest.mark.parametrize("bad_value", [np.inf, -np.inf, np.nan])
+def test_insert_many_non_finite(mapping_type, bad_value):
+    for use_fast_backend in [True, False]:
+        sketch = DDSketch(relative_accuracy=0.01, mapping_type=mapping_type,
+                          use_fast_backend=use_fast_backend)
+        with pytest.raises(ValueError):
+            sketch.insert_many([1.0, 2.0, bad_value])
+        # The failed batch must leave the sketch untouched
+        assert sketch.count == 0
+        assert sketch.positive_store.total_count == 0
+    
+    mapping = DDSketch(relative_accuracy=0.01, mapping_type=mapping_type).mapping
+    with pytest.raises(ValueError):
+        mapping.compute_bucket_indices(np.array([1.0, np.inf]))
+
+def test_insert_many_negative_values_disabled():
+    sketch = DDSketch(relative_accuracy=0.01, cont_neg=False)
+    with pytest.raises(ValueError):
+        sketch.insert_many([1.0, -1.0])
+    # The failed batch must leave the sketch untouched
+    assert sketch.count == 0
+    
+    sketch.insert_many([])
+    assert sketch.count == 0